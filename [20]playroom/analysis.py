@@ -1,7 +1,18 @@
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, filedialog, messagebox
 import os
 import mmap
+import re
+
+from line_index import LineIndex
+from page_cache import PageCache
+from text_search import Search
+
+PREVIEW_BYTES = 200  # 検索結果の一覧に表示する行の長さ (バイト)
+RENDER_MARGIN = 30  # 表示する行の前後に余分に入れておく行数
+FRAME_MS = 16  # スクロールの描き直しの間隔 (約60fps)
+WHEEL_LINES = 3  # マウスホイール1回でスクロールする行数
 
 class LargeTextViewer:
     def __init__(self, root):
@@ -12,10 +23,17 @@ class LargeTextViewer:
         # ファイル関連の変数
         self.current_file = None
         self.mm = None  # メモリマップトファイル
-        self.line_positions = []  # 各行の開始位置
+        self.index = None  # 行インデックス (バックグラウンドで作成)
+        self.pages = None  # デコード済みのページのキャッシュ
         self.total_lines = 0
-        self.lines_per_page = 1000  # 1度に表示する行数
         self.current_start_line = 0
+        self.rendered_first = 0  # テキストエリアに入っている最初の行
+        self.rendered_count = 0  # テキストエリアに入っている行数
+        self.match_line = None  # 検索結果から移動した行 (強調表示する)
+        self.pending_scroll = 0  # まだ反映していないスクロール量 (行)
+        self.scroll_job = None
+        self.search = None  # 実行中または最後の検索
+        self.listed_results = 0  # 一覧に追加済みの検索結果の数
 
         self.setup_ui()
 
@@ -25,6 +43,18 @@ class LargeTextViewer:
         self.toolbar.pack(fill="x", pady=5)
         
         ttk.Button(self.toolbar, text="ファイルを開く", command=self.open_file).pack(side="left", padx=5)
+
+        # 検索
+        self.search_var = tk.StringVar()
+        self.regex_var = tk.BooleanVar()
+        search_entry = ttk.Entry(self.toolbar, textvariable=self.search_var, width=30)
+        search_entry.pack(side="left", padx=5)
+        search_entry.bind("<Return>", lambda event: self.start_search())
+        ttk.Checkbutton(self.toolbar, text="正規表現", variable=self.regex_var).pack(side="left")
+        ttk.Button(self.toolbar, text="検索", command=self.start_search).pack(side="left", padx=5)
+        ttk.Button(self.toolbar, text="中止", command=self.cancel_search).pack(side="left")
+        self.search_status_var = tk.StringVar()
+        ttk.Label(self.toolbar, textvariable=self.search_status_var).pack(side="left", padx=5)
         
         # スクロール可能なテキストエリア
         self.text_frame = ttk.Frame(self.root)
@@ -34,14 +64,27 @@ class LargeTextViewer:
         self.y_scrollbar = ttk.Scrollbar(self.text_frame, orient="vertical")
         self.x_scrollbar = ttk.Scrollbar(self.root, orient="horizontal")
 
-        self.text_area.config(yscrollcommand=self.y_scrollbar.set,
-                            xscrollcommand=self.x_scrollbar.set)
+        # 縦のスクロールバーはテキストエリアの中身ではなくファイル全体の位置を表す (update_scrollbar で設定)
+        self.text_area.config(xscrollcommand=self.x_scrollbar.set)
+        self.line_height = tkfont.Font(font=self.text_area.cget("font")).metrics("linespace")
+        self.text_area.bind("<MouseWheel>", self.on_mousewheel)
+        self.text_area.bind("<Button-4>", self.on_mousewheel)
+        self.text_area.bind("<Button-5>", self.on_mousewheel)
+        self.text_area.bind("<Prior>", lambda event: self.scroll_lines(-self.visible_rows()) or "break")
+        self.text_area.bind("<Next>", lambda event: self.scroll_lines(self.visible_rows()) or "break")
+        self.text_area.bind("<Configure>", self.on_resize)
         self.y_scrollbar.config(command=self.custom_yview)
         self.x_scrollbar.config(command=self.text_area.xview)
 
         self.y_scrollbar.pack(side="right", fill="y")
         self.text_area.pack(side="left", fill="both", expand=True)
         self.x_scrollbar.pack(fill="x")
+        self.text_area.tag_config("match", background="yellow")
+
+        # 検索結果 (クリックでその行へ移動)
+        self.results_list = tk.Listbox(self.root, height=6)
+        self.results_list.pack(fill="x")
+        self.results_list.bind("<<ListboxSelect>>", self.jump_to_result)
 
         # ステータスバー
         self.status_var = tk.StringVar()
@@ -55,6 +98,15 @@ class LargeTextViewer:
         if file_path:
             try:
                 # 既存のファイルをクローズ
+                self.cancel_search(wait=True)
+                self.results_list.delete(0, tk.END)
+                self.match_line = None
+                if self.pages:
+                    self.pages.close()
+                    self.pages = None
+                if self.index:
+                    self.index.close()
+                    self.index = None
                 if self.current_file:
                     self.current_file.close()
                 if self.mm:
@@ -65,85 +117,188 @@ class LargeTextViewer:
                 self.mm = mmap.mmap(self.current_file.fileno(), 0, access=mmap.ACCESS_READ)
                 
                 # ファイルサイズを表示
-                file_size = os.path.getsize(file_path)
-                self.status_var.set(f"ファイルサイズ: {file_size / (1024*1024):.2f} MB")
+                self.file_size = os.path.getsize(file_path)
+                self.status_var.set(f"ファイルサイズ: {self.file_size / (1024*1024):.2f} MB")
 
-                # 行位置をインデックス化（最初の部分のみ）
-                self.index_initial_lines()
+                # 行位置のインデックスをバックグラウンドで作成（作成中もスクロールできる）
+                self.index = LineIndex(self.mm, file_path)
+                self.index.start()
+                self.total_lines = self.index.line_count
+                self.pages = PageCache(self.mm, self.index)
+                self.pages.start()
                 
                 # 最初の部分を表示
+                self.rendered_count = 0
+                self.current_start_line = 0
                 self.load_page(0)
+                self.update_index_status()
 
             except Exception as e:
                 messagebox.showerror("エラー", f"ファイルを開けませんでした: {str(e)}")
 
-    def index_initial_lines(self):
-        """最初の部分の行位置をインデックス化"""
-        self.line_positions = [0]
-        self.mm.seek(0)
-        
-        # 最初の10000行をインデックス化
-        for _ in range(10000):
-            line = self.mm.readline()
-            if not line:
-                break
-            self.line_positions.append(self.mm.tell())
-        
-        self.total_lines = len(self.line_positions)
+    def update_index_status(self):
+        """インデックス作成の進み具合をステータスバーとスクロールバーに反映する (作成中は定期的に呼ぶ)"""
+        index = self.index
+        if index is None:
+            return
+        self.total_lines = index.estimated_line_count()
+        size_text = f"ファイルサイズ: {self.file_size / (1024*1024):.2f} MB"
+        if index.error:
+            self.status_var.set(f"{size_text}  インデックス作成エラー: {str(index.error)}")
+        elif index.done:
+            cached = "  (キャッシュ)" if index.cached else ""
+            sparse = f"  ({index.stride:,} 行ごとに記録)" if index.stride > 1 else ""
+            self.status_var.set(f"{size_text}  {index.line_count:,} 行{sparse}{cached}")
+        else:
+            self.status_var.set(f"{size_text}  インデックス作成中 {index.progress * 100:.1f}% ({index.line_count:,} 行)")
+            self.root.after(200, self.update_index_status)
+        self.update_scrollbar()
+
+    def start_search(self):
+        """入力された文字列 (または正規表現) でファイル全体を検索する"""
+        pattern = self.search_var.get()
+        if not self.mm or not pattern:
+            return
+        self.cancel_search(wait=True)
+        try:
+            self.search = Search(self.current_file.name, pattern, self.index, self.regex_var.get())
+        except re.error as e:
+            messagebox.showerror("エラー", f"正規表現が正しくありません: {str(e)}")
+            return
+        self.results_list.delete(0, tk.END)
+        self.listed_results = 0
+        self.search.start()
+        self.update_search_status()
+
+    def cancel_search(self, wait=False):
+        if self.search and self.search.running:
+            self.search.cancel()
+            if wait:
+                self.search.wait()
+
+    def update_search_status(self):
+        """見つかった行を一覧に追加し、進み具合を表示する (検索中は定期的に呼ぶ)"""
+        search = self.search
+        results = search.results[self.listed_results:]
+        if results:
+            self.results_list.insert(tk.END, *(f"{line + 1}: {self.line_preview(offset)}" for line, offset in results))
+            self.listed_results += len(results)
+        status = f"{len(search.results):,} 件  {search.throughput:.2f} GB/s"
+        if search.running:
+            self.search_status_var.set(f"検索中 {search.progress * 100:.1f}%  {status}")
+            self.root.after(100, self.update_search_status)
+        elif search.error:
+            self.search_status_var.set(f"検索エラー: {str(search.error)}")
+        elif search.cancelled:
+            self.search_status_var.set(f"検索を中止しました  {status}")
+        else:
+            self.search_status_var.set(f"検索完了 ({search.elapsed:.1f} 秒)  {status}")
+
+    def line_preview(self, offset):
+        end = self.mm.find(b'\n', offset, offset + PREVIEW_BYTES)
+        return self.mm[offset:end if end >= 0 else offset + PREVIEW_BYTES].decode('utf-8', errors='replace').rstrip()
+
+    def jump_to_result(self, event=None):
+        selection = self.results_list.curselection()
+        if not selection or not self.search:
+            return
+        self.match_line = self.search.results[selection[0]][0]
+        self.rendered_count = 0  # 強調表示を付け直すため入れ直す
+        self.load_page(self.match_line)
+        self.update_scrollbar()
+
+    def visible_rows(self):
+        """テキストエリアに表示できる行数"""
+        return max(1, self.text_area.winfo_height() // self.line_height)
+
+    def update_scrollbar(self):
+        if self.total_lines > 0:
+            fraction = self.current_start_line / self.total_lines
+            self.y_scrollbar.set(fraction, fraction + (self.visible_rows() / self.total_lines))
 
     def load_page(self, start_line):
-        """指定された行から一定数の行を読み込んで表示"""
+        """start_line 行目が先頭になるように表示する
+
+        表示する行と前後 RENDER_MARGIN 行だけを1回の insert でテキストエリアに入れ、
+        その範囲の中で済むスクロールは表示位置を動かすだけにする。
+        """
         if not self.mm:
             return
 
-        self.text_area.delete(1.0, tk.END)
-        
         try:
-            # 指定された行位置にシーク
-            if start_line < len(self.line_positions):
-                self.mm.seek(self.line_positions[start_line])
-            
-            # 指定された行数分だけ読み込んで表示
-            for _ in range(self.lines_per_page):
-                line = self.mm.readline()
-                if not line:
-                    break
-                try:
-                    # バイナリデータをテキストにデコード
-                    self.text_area.insert(tk.END, line.decode('utf-8'))
-                except UnicodeDecodeError:
-                    self.text_area.insert(tk.END, "[デコードエラー]\n")
+            rows = self.visible_rows()
+            # インデックス作成中は作成済みの行まで
+            line_count = self.index.line_count
+            start_line = max(0, min(start_line, line_count - rows))
+            first = self.rendered_first
+            covered = (self.rendered_count and first <= start_line
+                       and min(start_line + rows, line_count) <= first + self.rendered_count)
+            if not covered:
+                first = max(0, start_line - RENDER_MARGIN)
+                lines = self.pages.lines(first, start_line - first + rows + RENDER_MARGIN)
+                self.text_area.delete("1.0", tk.END)
+                self.text_area.insert("1.0", "\n".join(lines))
+                self.rendered_first = first
+                self.rendered_count = len(lines)
+                if self.match_line is not None and first <= self.match_line < first + len(lines):
+                    row = self.match_line - first + 1
+                    self.text_area.tag_add("match", f"{row}.0", f"{row + 1}.0")
+            # 指定した位置の行をテキストエリアの一番上に表示する
+            self.text_area.yview(f"{start_line - first + 1}.0")
 
+            # スクロールしている方向のページを先読みさせる
+            if start_line >= self.current_start_line:
+                self.pages.prefetch(start_line + rows, 1)
+            else:
+                self.pages.prefetch(start_line, -1)
             self.current_start_line = start_line
-            
+
         except Exception as e:
             print(f"読み込みエラー: {str(e)}")
 
+    def scroll_lines(self, lines):
+        """lines 行スクロールする (続けて来たイベントはまとめ、1フレームに1回だけ描き直す)"""
+        self.pending_scroll += lines
+        if self.scroll_job is None:
+            self.scroll_job = self.root.after(FRAME_MS, self.apply_scroll)
+
+    def apply_scroll(self):
+        self.scroll_job = None
+        lines, self.pending_scroll = self.pending_scroll, 0
+        if lines and self.mm:
+            self.load_page(self.current_start_line + lines)
+            self.update_scrollbar()
+
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_lines(-WHEEL_LINES)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll_lines(WHEEL_LINES)
+        return "break"  # テキストエリア自体はスクロールさせない
+
+    def on_resize(self, event):
+        if self.mm:
+            self.load_page(self.current_start_line)
+            self.update_scrollbar()
+
     def custom_yview(self, *args):
         """カスタムスクロール処理"""
         if not self.mm:
             return
         
         if args[0] == "moveto":
-            # スクロール位置から表示すべき行を計算
+            # スクロール位置から表示すべき行を計算 (作成中は見積もった全体の行数に対する割合)
             fraction = float(args[1])
             target_line = int(fraction * self.total_lines)
             self.load_page(target_line)
+            self.update_scrollbar()
         
         elif args[0] == "scroll":
             units = int(args[1])
             if args[2] == "units":  # 1行単位のスクロール
-                target_line = self.current_start_line + units
+                self.scroll_lines(units)
             else:  # ページ単位のスクロール
-                target_line = self.current_start_line + (units * self.lines_per_page)
-            
-            target_line = max(0, min(target_line, self.total_lines - self.lines_per_page))
-            self.load_page(target_line)
-
-        # スクロールバーの位置を更新
-        if self.total_lines > 0:
-            fraction = self.current_start_line / self.total_lines
-            self.y_scrollbar.set(fraction, fraction + (self.lines_per_page/self.total_lines))
+                self.scroll_lines(units * self.visible_rows())
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,404 @@
+# ベンチマークの計測項目 (コレクター) とサンプリング
+#
+# 計測項目ごとにコレクターを登録し、それぞれ自分の間隔で値を取る。
+# GPU や温度センサーが無い環境では該当するコレクターを使わないだけで、他の項目は記録を続ける。
+# tkinter / matplotlib には依存しないので、ヘッドレスでの記録 (headless.py) からも使える。
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import psutil
+
+from workloads import KERNELS
+
+# 記録する列と型 (timestamp はローカル時刻のナノ秒)
+DATA_COLUMNS = {
+    'timestamp': np.int64,
+    'cpu_usage': np.float32,
+    'cpu_freq': np.float32,
+    'cpu_temp': np.float32,  # CPU温度を追加
+    'memory_usage': np.float32,
+    'memory_available': np.float32,
+    'memory_speed': np.float32,
+    'gpu_usage': np.float32,
+    'gpu_memory': np.float32,
+    'gpu_temp': np.float32,
+    'gpu_clock': np.float32,
+    'workload': np.float32,  # 実行中のベンチマーク (WORKLOAD_NAMES の番号 + 1, 0 は実行なし)
+    'workload_processes': np.float32,
+    'workload_throughput': np.float32  # 実行中のベンチマークのスループット (単位はカーネルごと)
+}
+WORKLOAD_NAMES = list(KERNELS)
+
+MAX_SAMPLE_RATE = 100  # 1秒あたりのサンプル数の上限
+
+# 名前 -> コレクターのクラス
+COLLECTORS = {}
+
+
+def register_collector(cls):
+    """コレクターを登録するデコレーター"""
+    COLLECTORS[cls.name] = cls
+    return cls
+
+
+class Collector:
+    """計測項目の基底クラス
+
+    name: 登録名, columns: 書き込む列, interval: 既定の取得間隔 (秒, 0 なら毎回)
+    """
+
+    name = None
+    columns = ()
+    interval = 0.0
+
+    def __init__(self, interval=None):
+        if interval is not None:
+            self.interval = interval
+
+    def available(self):
+        """この環境で使えるか"""
+        return True
+
+    def column_specs(self):
+        """DATA_COLUMNS 以外に追加で記録する列 {列名: dtype または (dtype, 幅)}"""
+        return {}
+
+    def start(self):
+        """サンプリング開始時の準備"""
+
+    def stop(self):
+        """サンプリング終了時の後片付け"""
+
+    def collect(self):
+        """{列名: 値} を返す"""
+        raise NotImplementedError
+
+
+@register_collector
+class CpuCollector(Collector):
+    name = 'cpu'
+    columns = ('cpu_usage', 'core_usage')
+
+    def __init__(self, interval=None):
+        super().__init__(interval)
+        self.cores = psutil.cpu_count() or 1
+
+    def column_specs(self):
+        # 平均すると1コアだけ張り付いている状態が見えなくなるので、コアごとの値も残す
+        return {'core_usage': (np.float32, self.cores)}
+
+    def start(self):
+        # 初回呼び出しで基準値を取り、以降はブロックせずに前回呼び出しからの使用率を得る
+        psutil.cpu_percent(percpu=True)
+
+    def collect(self):
+        core_usage = np.asarray(psutil.cpu_percent(interval=None, percpu=True), dtype=np.float32)
+        return {
+            'cpu_usage': core_usage.mean(),
+            'core_usage': core_usage
+        }
+
+
+@register_collector
+class CpuFreqCollector(Collector):
+    name = 'cpu_freq'
+    columns = ('cpu_freq', 'core_freq')
+    interval = 1.0  # コア数ぶん sysfs を読むので毎回は取らない
+
+    def __init__(self, interval=None):
+        super().__init__(interval)
+        try:
+            self.cores = len(psutil.cpu_freq(percpu=True))
+        except Exception:
+            self.cores = 0
+
+    def available(self):
+        return self.cores > 0
+
+    def column_specs(self):
+        return {'core_freq': (np.float32, self.cores)}
+
+    def collect(self):
+        core_freq = np.fromiter((freq.current for freq in psutil.cpu_freq(percpu=True)),
+                                dtype=np.float32, count=self.cores)
+        return {
+            'cpu_freq': core_freq.mean(),
+            'core_freq': core_freq
+        }
+
+
+@register_collector
+class MemoryCollector(Collector):
+    name = 'memory'
+    columns = ('memory_usage', 'memory_available', 'memory_speed')
+
+    def collect(self):
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        return {
+            'memory_usage': memory.percent,
+            'memory_available': memory.available / (1024 * 1024 * 1024),
+            'memory_speed': swap.used / (1024 * 1024)
+        }
+
+
+@register_collector
+class CpuTempCollector(Collector):
+    name = 'cpu_temp'
+    columns = ('cpu_temp',)
+    interval = 1.0  # センサーの読み出しは重いので毎回は取らない
+
+    def _sensor(self):
+        temps = psutil.sensors_temperatures() if hasattr(psutil, 'sensors_temperatures') else {}
+        if 'coretemp' in temps:
+            return temps['coretemp']
+        return next(iter(temps.values()), None)
+
+    def available(self):
+        try:
+            return bool(self._sensor())
+        except Exception:
+            return False
+
+    def collect(self):
+        return {'cpu_temp': self._sensor()[0].current}
+
+
+@register_collector
+class GpuCollector(Collector):
+    name = 'gpu'
+    columns = ('gpu_usage', 'gpu_memory', 'gpu_temp', 'gpu_clock')
+    interval = 1.0  # GPUtil は nvidia-smi を起動するので間隔を空ける
+
+    def available(self):
+        try:
+            import GPUtil
+            return len(GPUtil.getGPUs()) > 0
+        except Exception:
+            return False
+
+    def collect(self):
+        import GPUtil
+        gpu = GPUtil.getGPUs()[0]
+        return {
+            'gpu_usage': gpu.load * 100,
+            'gpu_memory': gpu.memoryUsed,
+            'gpu_temp': gpu.temperature,
+            # GPUクロック情報は利用できないため0を設定
+            'gpu_clock': 0
+        }
+
+
+@register_collector
+class WorkloadCollector(Collector):
+    """suite に設定された BenchmarkSuite の実行状況を記録する"""
+
+    name = 'workload'
+    columns = ('workload', 'workload_processes', 'workload_throughput')
+
+    def __init__(self, interval=None):
+        super().__init__(interval)
+        self.suite = None
+
+    def collect(self):
+        suite = self.suite
+        current = suite.current if suite else None
+        if current is None:
+            return {'workload': 0, 'workload_processes': 0, 'workload_throughput': 0}
+        return {
+            'workload': WORKLOAD_NAMES.index(current) + 1,
+            'workload_processes': suite.processes,
+            'workload_throughput': suite.throughput
+        }
+
+
+@register_collector
+class ProcessCollector(Collector):
+    """CPU 使用率の高いプロセスの上位 top 件 (CPU, RSS, IO) を table に保持する
+
+    時系列の列は持たない。プロセス表の走査はプロセス数が多いと 100ms を超えるので、
+    サンプリングとは別のスレッドで interval ごとに行い、collect() は何もしない (UI は table を読むだけ)。
+    psutil.Process は走査の間で使い回し、attrs の取得は oneshot でまとめる。
+    """
+
+    name = 'processes'
+    interval = 2.0
+    ATTRS = ['name', 'cpu_times', 'memory_info', 'io_counters']
+
+    def __init__(self, interval=None, top=10):
+        super().__init__(interval)
+        self.top = top
+        self.table = []  # [(pid, 名前, CPU%, RSS(MB), 読み込み(MB/s), 書き込み(MB/s))]
+        self.version = 0  # table を更新するたびに増える (UI の再描画判定用)
+        self._processes = {}  # pid -> psutil.Process (走査の間で使い回す)
+        self._previous = {}  # pid -> (CPU 時間, 読み込みバイト, 書き込みバイト)
+        self._last = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def collect(self):
+        return {}
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"{self.name} 取得エラー: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def _process(self, pid):
+        """pid の Process (前回の走査のものを使い回す、pid が再利用されていれば作り直す)"""
+        process = self._processes.get(pid)
+        if process is None or not process.is_running():
+            process = psutil.Process(pid)
+        return process
+
+    def scan(self):
+        """プロセス表を走査して table を更新する"""
+        now = time.perf_counter()
+        elapsed = now - self._last if self._last else None
+        self._last = now
+
+        processes = {}
+        current = {}
+        rows = []
+        for pid in psutil.pids():
+            try:
+                process = self._process(pid)
+                info = process.as_dict(attrs=self.ATTRS, ad_value=None)
+            except psutil.Error:
+                continue
+            processes[pid] = process
+            cpu_times = info['cpu_times']
+            if cpu_times is None:
+                continue
+            io = info['io_counters']
+            counters = (cpu_times.user + cpu_times.system,
+                        io.read_bytes if io else 0, io.write_bytes if io else 0)
+            current[pid] = counters
+            previous = self._previous.get(pid)
+            if elapsed and previous:
+                rss = info['memory_info'].rss if info['memory_info'] else 0
+                rows.append((pid, info['name'] or '',
+                             (counters[0] - previous[0]) / elapsed * 100,
+                             rss / (1024 * 1024),
+                             (counters[1] - previous[1]) / elapsed / (1024 * 1024),
+                             (counters[2] - previous[2]) / elapsed / (1024 * 1024)))
+        # 終了したプロセスの分は捨てる
+        self._processes = processes
+        self._previous = current
+
+        if rows:
+            cpu = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+            # 全体をソートせず上位 top 件だけを取り出す
+            top = np.argpartition(-cpu, min(self.top, len(rows)) - 1)[:self.top]
+            self.table = sorted((rows[i] for i in top), key=lambda row: -row[2])
+            self.version += 1
+
+
+def build_collectors(names=None, intervals=None):
+    """名前のリスト (省略時は登録済みすべて) からこの環境で使えるコレクターを作る"""
+    intervals = intervals or {}
+    collectors = []
+    for name in names or COLLECTORS:
+        collector = COLLECTORS[name](intervals.get(name))
+        if collector.available():
+            collectors.append(collector)
+        else:
+            print(f"{name}: この環境では使えないため記録しません")
+    return collectors
+
+
+def session_columns(collectors):
+    """DATA_COLUMNS に各コレクターの追加の列を加えた、記録する列の一覧"""
+    columns = dict(DATA_COLUMNS)
+    for collector in collectors:
+        columns.update(collector.column_specs())
+    return columns
+
+
+def find_collector(collectors, name):
+    return next((collector for collector in collectors if collector.name == name), None)
+
+
+def get_gpu_name():
+    try:
+        import GPUtil
+        return GPUtil.getGPUs()[0].name
+    except Exception:
+        return "Unknown GPU"
+
+
+class Sampler:
+    """コレクターを一定間隔で回し、全列がそろったサンプルを作る
+
+    各コレクターは自分の interval が経過したときだけ値を取り直し、それ以外は前回の値を使う。
+    """
+
+    def __init__(self, collectors, sample_interval=1.0):
+        self.collectors = list(collectors)
+        self.sample_interval = sample_interval
+        self.columns = session_columns(self.collectors)
+        # 使えるコレクターが書き込む列 (それ以外の列は記録の形をそろえるために 0 のまま)
+        written = {'timestamp'}.union(*(collector.columns for collector in self.collectors))
+        self.active_columns = {name: spec for name, spec in self.columns.items() if name in written}
+        self._values = dict.fromkeys(self.columns, 0)
+        self._due = [0.0] * len(self.collectors)
+
+    def start(self):
+        for collector in self.collectors:
+            collector.start()
+        self._due = [0.0] * len(self.collectors)
+
+    def stop(self):
+        for collector in self.collectors:
+            collector.stop()
+
+    def sample(self, now=None):
+        now = time.perf_counter() if now is None else now
+        for i, collector in enumerate(self.collectors):
+            if now >= self._due[i]:
+                try:
+                    self._values.update(collector.collect())
+                except Exception as e:
+                    print(f"{collector.name} 取得エラー: {str(e)}")
+                self._due[i] = now + collector.interval
+        sample = dict(self._values)
+        sample['timestamp'] = np.datetime64(datetime.now(), 'ns').astype(np.int64)
+        return sample
+
+    def run(self, running, callback):
+        """running() が真の間サンプルを取り、callback(sample) に渡す"""
+        self.start()
+        try:
+            next_tick = time.perf_counter()
+            while running():
+                try:
+                    callback(self.sample())
+                except Exception as e:
+                    print(f"モニタリングエラー: {str(e)}")
+
+                # 処理時間を差し引いて一定間隔を保つ (大きく遅れた場合は追いつこうとせず仕切り直す)
+                next_tick += self.sample_interval
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -self.sample_interval:
+                    next_tick = time.perf_counter()
+        finally:
+            self.stop()
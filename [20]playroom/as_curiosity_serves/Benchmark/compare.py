@@ -0,0 +1,282 @@
+# ベンチマーク結果 (benchmark_results_*.csv) の比較レポート
+#
+# 各 CSV を1行ずつ読み、フェーズ (セッション全体の 'all' と、実行中のベンチマークとプロセス数ごと) に
+# 列の分布 (平均, p95, p99) を集計する。最初のファイルを基準に、平均の差のブートストラップ信頼区間が
+# 0 を含まず、変化が threshold を超えた項目を退行 / 改善として報告する。
+# 'all' は負荷の有無が混ざるので、どのセッションにもベンチマークの列が無い場合だけ判定に使い、
+# それ以外では参考として表示するだけにする (判定はベンチマークごとのフェーズで行う)。
+# 片方にしか無いフェーズ・列も報告し、判定に使える項目が1つも無い場合は (退行が無くても) 失敗にする。
+# メモリに持つのはフェーズ・列ごとに固定数のサンプル (リザーバーサンプリング) だけなので、長いセッションでも一定。
+# 例: python compare.py base.csv new.csv
+#     python compare.py base.csv new.csv --html report.html --threshold 0.03
+
+import argparse
+import csv
+import html
+import math
+import random
+import re
+import sys
+
+import numpy as np
+
+from workloads import KERNELS
+
+WORKLOAD_NAMES = list(KERNELS)
+RESERVOIR_SIZE = 5000  # フェーズ・列ごとに保持するサンプル数 (分位点用)
+BLOCK_SIZE = 10  # ブロック平均にまとめるサンプル数 (自己相関の影響を抑えるため)
+BOOTSTRAP_ROUNDS = 1000
+CONFIDENCE = 0.95
+
+# 値が大きいほど良い列 (それ以外は小さいほど良いとみなす)
+HIGHER_IS_BETTER = {'workload_throughput', 'cpu_freq', 'memory_available'}
+ALL_PHASE = 'all'  # セッション全体 (ベンチマークの列が無い記録とも比較できる)
+# フェーズの判定に使う列と、比較しない列
+PHASE_COLUMNS = {'workload', 'workload_processes'}
+SKIP_COLUMNS = {'timestamp'} | PHASE_COLUMNS
+PER_CORE = re.compile(r'^core_(usage|freq)_\d+$')
+
+
+class Reservoir:
+    """一様なリザーバーサンプリングで高々 size 件を保持し、平均は全件から求める"""
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.values = []
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            i = self.rng.randrange(self.count)
+            if i < self.size:
+                self.values[i] = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+
+class MetricStats:
+    """1フェーズ・1列分の集計 (生の値と、BLOCK_SIZE 件ごとのブロック平均)"""
+
+    def __init__(self, rng):
+        self.samples = Reservoir(RESERVOIR_SIZE, rng)
+        self.blocks = Reservoir(RESERVOIR_SIZE, rng)
+        self._block_sum = 0.0
+        self._block_count = 0
+
+    def add(self, value):
+        self.samples.add(value)
+        self._block_sum += value
+        self._block_count += 1
+        if self._block_count == BLOCK_SIZE:
+            self.blocks.add(self._block_sum / BLOCK_SIZE)
+            self._block_sum = 0.0
+            self._block_count = 0
+
+    def summary(self):
+        values = np.asarray(self.samples.values)
+        return {
+            'count': self.samples.count,
+            'mean': self.samples.mean,
+            'p95': float(np.percentile(values, 95)) if len(values) else math.nan,
+            'p99': float(np.percentile(values, 99)) if len(values) else math.nan,
+        }
+
+    def block_means(self):
+        # ブロックが少ない短いセッションでは生の値を使う
+        if len(self.blocks.values) >= 20:
+            return np.asarray(self.blocks.values)
+        return np.asarray(self.samples.values)
+
+
+def phase_name(row):
+    """行のフェーズ (ベンチマークの列が無ければ None)"""
+    if 'workload' not in row:
+        return None
+    workload = int(float(row.get('workload') or 0))
+    if workload <= 0:
+        return 'idle'
+    name = WORKLOAD_NAMES[workload - 1] if workload <= len(WORKLOAD_NAMES) else f'workload{workload}'
+    return f"{name} x{int(float(row.get('workload_processes') or 1))}"
+
+
+def load_session(path, per_core=False, seed=0):
+    """CSV を1行ずつ読み、{フェーズ: {列名: MetricStats}} を返す (各行は 'all' と自分のフェーズに入る)"""
+    rng = random.Random(seed)
+    phases = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = [name for name in reader.fieldnames
+                   if name not in SKIP_COLUMNS and (per_core or not PER_CORE.match(name))]
+        for row in reader:
+            targets = [phases.setdefault(ALL_PHASE, {})]
+            phase = phase_name(row)
+            if phase is not None:
+                targets.append(phases.setdefault(phase, {}))
+            for name in columns:
+                value = row.get(name)
+                if value in (None, ''):
+                    continue
+                try:
+                    value = float(value)
+                except ValueError:
+                    continue
+                for metrics in targets:
+                    stats = metrics.get(name)
+                    if stats is None:
+                        stats = metrics[name] = MetricStats(rng)
+                    stats.add(value)
+    return phases
+
+
+def bootstrap_mean_difference(base, other, rounds=BOOTSTRAP_ROUNDS, confidence=CONFIDENCE, seed=0):
+    """mean(other) - mean(base) のブートストラップ信頼区間 (下限, 上限)"""
+    rng = np.random.default_rng(seed)
+    differences = np.empty(rounds)
+    # 一度に確保する乱数の量を抑えるため、何回分かずつまとめて計算する
+    chunk = max(1, 2_000_000 // max(len(base), len(other)))
+    for start in range(0, rounds, chunk):
+        size = min(chunk, rounds - start)
+        base_means = base[rng.integers(0, len(base), (size, len(base)))].mean(axis=1)
+        other_means = other[rng.integers(0, len(other), (size, len(other)))].mean(axis=1)
+        differences[start:start + size] = other_means - base_means
+    alpha = (1 - confidence) / 2
+    return float(np.quantile(differences, alpha)), float(np.quantile(differences, 1 - alpha))
+
+
+def compare_sessions(paths, threshold=0.05, per_core=False):
+    """最初のセッションを基準に比較し、(行のリスト, 退行の数, 片方にしか無い項目, 比較した項目の数) を返す
+
+    行: (フェーズ, 列名, セッション番号, 集計, 基準との差の割合, 信頼区間, 判定)
+    片方にしか無い項目: (セッション番号, フェーズ, 列名 (フェーズごと無い場合は None), 無い側)
+    比較した項目の数には、参考として表示するだけの 'all' は含めない。
+    """
+    sessions = [load_session(path, per_core) for path in paths]
+    base = sessions[0]
+    # ベンチマークのフェーズがあるセッションが1つでもあれば 'all' は参考扱い
+    gate_all = all(session.keys() <= {ALL_PHASE} for session in sessions)
+    rows = []
+    regressions = 0
+    compared = 0
+    missing = []
+    for index, session in enumerate(sessions[1:], start=1):
+        for phase in base.keys() | session.keys():
+            if phase not in session:
+                missing.append((index, phase, None, '比較'))
+            elif phase not in base:
+                missing.append((index, phase, None, '基準'))
+            else:
+                missing.extend((index, phase, name, '比較') for name in base[phase].keys() - session[phase].keys())
+                missing.extend((index, phase, name, '基準') for name in session[phase].keys() - base[phase].keys())
+    missing.sort(key=lambda item: (item[0], item[1], item[2] or ''))
+    for phase in base:
+        for name, base_stats in base[phase].items():
+            base_summary = base_stats.summary()
+            rows.append((phase, name, 0, base_summary, None, None, ''))
+            for index, session in enumerate(sessions[1:], start=1):
+                stats = session.get(phase, {}).get(name)
+                if stats is None:
+                    continue
+                reference = phase == ALL_PHASE and not gate_all
+                compared += not reference
+                summary = stats.summary()
+                low, high = bootstrap_mean_difference(base_stats.block_means(), stats.block_means())
+                change = (summary['mean'] - base_summary['mean']) / abs(base_summary['mean']) \
+                    if base_summary['mean'] else 0.0
+                verdict = ''
+                if (low > 0 or high < 0) and abs(change) > threshold:
+                    worse = change < 0 if name in HIGHER_IS_BETTER else change > 0
+                    verdict = '退行' if worse else '改善'
+                    if reference:
+                        verdict += ' (参考)'
+                    else:
+                        regressions += worse
+                rows.append((phase, name, index, summary, change, (low, high), verdict))
+    return rows, regressions, missing, compared
+
+
+def describe_missing(paths, item):
+    index, phase, name, side = item
+    target = f"[{phase}]" if name is None else f"[{phase}] {name}"
+    holder = paths[0] if side == '基準' else paths[index]
+    return f"{target} が{side}側 ({holder}) にありません"
+
+
+def format_text(paths, rows, missing=()):
+    lines = [f"基準: {paths[0]}"] + [f"比較 {i}: {path}" for i, path in enumerate(paths[1:], start=1)]
+    current = None
+    for phase, name, index, summary, change, interval, verdict in rows:
+        if phase != current:
+            current = phase
+            lines.append(f"\n[{phase}]")
+        label = name if index == 0 else f"  比較 {index}"
+        line = (f"  {label:22s} n={summary['count']:7d}  mean={summary['mean']:12.4g}  "
+                f"p95={summary['p95']:12.4g}  p99={summary['p99']:12.4g}")
+        if change is not None:
+            line += f"  差 {change * 100:+7.2f}%  95%CI [{interval[0]:+.4g}, {interval[1]:+.4g}]  {verdict}"
+        lines.append(line)
+    if missing:
+        lines.append("\n[片方にしか無い項目]")
+        lines.extend(f"  {describe_missing(paths, item)}" for item in missing)
+    return '\n'.join(lines) + '\n'
+
+
+def format_html(paths, rows, missing=()):
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>ベンチマーク比較</title>',
+             '<style>body{font-family:sans-serif}table{border-collapse:collapse}'
+             'td,th{border:1px solid #999;padding:2px 6px;text-align:right}'
+             '.regression{background:#fbb}.improvement{background:#bfb}</style></head><body>',
+             '<h1>ベンチマーク比較</h1><ol start="0">']
+    parts.extend(f'<li>{html.escape(path)}</li>' for path in paths)
+    parts.append('</ol><table><tr><th>フェーズ</th><th>列</th><th>セッション</th><th>n</th><th>mean</th>'
+                 '<th>p95</th><th>p99</th><th>差</th><th>95%CI</th><th>判定</th></tr>')
+    for phase, name, index, summary, change, interval, verdict in rows:
+        css = {'退行': ' class="regression"', '改善': ' class="improvement"'}.get(verdict, '')
+        change_text = f'{change * 100:+.2f}%' if change is not None else ''
+        interval_text = f'[{interval[0]:+.4g}, {interval[1]:+.4g}]' if interval else ''
+        parts.append(f'<tr{css}><td>{html.escape(phase)}</td><td>{html.escape(name)}</td><td>{index}</td>'
+                     f'<td>{summary["count"]}</td><td>{summary["mean"]:.4g}</td><td>{summary["p95"]:.4g}</td>'
+                     f'<td>{summary["p99"]:.4g}</td><td>{change_text}</td><td>{interval_text}</td>'
+                     f'<td>{verdict}</td></tr>')
+    parts.append('</table>')
+    if missing:
+        parts.append('<h2>片方にしか無い項目</h2><ul>')
+        parts.extend(f'<li>{html.escape(describe_missing(paths, item))}</li>' for item in missing)
+        parts.append('</ul>')
+    parts.append('</body></html>\n')
+    return ''.join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ベンチマーク結果の CSV を比較する (最初のファイルが基準)")
+    parser.add_argument("paths", nargs="+", help="benchmark_results_*.csv (2つ以上)")
+    parser.add_argument("--threshold", type=float, default=0.05, help="退行とみなす平均の変化の割合")
+    parser.add_argument("--per-core", action="store_true", help="コアごとの列も比較する")
+    parser.add_argument("--html", help="HTML のレポートを書き出すファイル")
+    args = parser.parse_args(argv)
+    if len(args.paths) < 2:
+        parser.error("比較するファイルを2つ以上指定してください")
+
+    rows, regressions, missing, compared = compare_sessions(args.paths, args.threshold, args.per_core)
+    print(format_text(args.paths, rows, missing), end='')
+    if args.html:
+        with open(args.html, 'w', encoding='utf-8') as f:
+            f.write(format_html(args.paths, rows, missing))
+    if not compared:
+        print("比較できる項目がありません (フェーズや列が一致しません)")
+        sys.exit(2)
+    if regressions:
+        print(f"性能の退行が {regressions} 項目あります")
+        sys.exit(1)
+    print("基準からの退行はありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# 計測値を HTTP で公開する (localhost のみ)
+#
+#   /metrics             現在の値を Prometheus のテキスト形式で返す
+#   /window?seconds=30   直近の指定秒数 (保持している範囲まで) のサンプルを列ごとの JSON で返す
+#                        正の有限な数でなければ 400
+#
+# 公開するのは渡された列だけなので、使えないコレクターの列 (記録では 0 のまま) は Sampler.active_columns で除いて渡す。
+# サンプリングスレッドからは publish() でサンプルを渡すだけで、ロックも整形も行わない。
+# 応答はサンプルが増えたときに1度だけ整形してバイト列を使い回すので、頻繁に取得されても負荷は小さい。
+# 例: curl http://127.0.0.1:9750/metrics
+
+import json
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+DEFAULT_PORT = 9750
+DEFAULT_SECONDS = 10 * 60  # /window で返せる最大の秒数
+METRIC_PREFIX = 'benchmark_'
+WINDOW_CACHE_SIZE = 4  # 整形済みの /window の応答をいくつまで保持するか
+
+
+class MetricsExporter:
+    """直近のサンプルを保持し、HTTP サーバーのスレッドから整形して返す"""
+
+    def __init__(self, columns, capacity, port=DEFAULT_PORT, host='127.0.0.1'):
+        self.columns = dict(columns)
+        self.data = RingBuffer(self.columns, capacity)
+        self.host = host
+        self.port = port
+        self._metrics = (-1, b'')  # (サンプル総数, 整形済みの応答)
+        self._windows = OrderedDict()  # 行数 -> (サンプル総数, 整形済みの応答) (最近使ったものが末尾)
+        self._windows_lock = threading.Lock()  # HTTP サーバーはリクエストごとのスレッドで動く
+        # 列ごとの TYPE 行は変わらないので先に作っておく
+        self._headers = {name: f'# TYPE {METRIC_PREFIX}{name} gauge\n'
+                         for name in self.columns if name != 'timestamp'}
+        self._server = None
+
+    def publish(self, sample):
+        """サンプリングスレッドから呼ぶ (リングバッファへの追加だけ)"""
+        self.data.append(sample)
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/metrics':
+                    body, content_type = exporter.metrics(), 'text/plain; version=0.0.4'
+                elif url.path == '/window':
+                    try:
+                        seconds = float(parse_qs(url.query).get('seconds', ['30'])[0])
+                    except ValueError:
+                        seconds = math.nan
+                    if not math.isfinite(seconds) or seconds <= 0:
+                        self.send_error(400, 'seconds must be a positive number')
+                        return
+                    body, content_type = exporter.window(seconds), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _snapshot(self, n=None):
+        """読み出し中に書き込まれた行を避けるため、コピーしてから総数が変わっていないか確かめる"""
+        while True:
+            total = self.data.total
+            columns = {name: values.copy() for name, values in self.data.latest(n).items()}
+            if self.data.total == total:
+                return total, columns
+
+    def metrics(self):
+        total, cached = self._metrics
+        if total == self.data.total:
+            return cached
+        total, latest = self._snapshot(1)
+        lines = []
+        if total:
+            for name, header in self._headers.items():
+                value = latest[name][0]
+                lines.append(header)
+                if np.ndim(value):
+                    lines.extend(f'{METRIC_PREFIX}{name}{{index="{i}"}} {v:g}\n' for i, v in enumerate(value))
+                else:
+                    lines.append(f'{METRIC_PREFIX}{name} {value:g}\n')
+            lines.append(f'# TYPE {METRIC_PREFIX}samples_total counter\n{METRIC_PREFIX}samples_total {total}\n')
+        body = ''.join(lines).encode('utf-8')
+        self._metrics = (total, body)
+        return body
+
+    def window(self, seconds):
+        """直近 seconds 秒のサンプル (保持している範囲を超える分は切り詰める) の JSON"""
+        timestamps = self.data.column('timestamp')
+        n = 0
+        if len(timestamps):
+            span = int(timestamps[-1] - timestamps[0])
+            n = len(timestamps) - np.searchsorted(timestamps, timestamps[-1] - int(min(seconds * 1e9, span)))
+        with self._windows_lock:
+            total, cached = self._windows.get(n, (-1, b''))
+        if total == self.data.total:
+            return cached
+        total, columns = self._snapshot(n)
+        body = json.dumps({name: values.tolist() for name, values in columns.items()}).encode('utf-8')
+        with self._windows_lock:
+            self._windows[n] = (total, body)
+            self._windows.move_to_end(n)
+            while len(self._windows) > WINDOW_CACHE_SIZE:
+                self._windows.popitem(last=False)
+        return body
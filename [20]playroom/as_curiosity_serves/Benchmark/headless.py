@@ -0,0 +1,121 @@
+# 画面なしでベンチマークを記録する (サーバー用)
+#
+# tkinter / matplotlib を読み込まずに、コレクターの値をセッションのディレクトリへ書き出す。
+# 終了時に起動時間と、記録中に自分自身が使った CPU 時間・メモリを表示する。
+# 例: python headless.py --rate 10 --duration 600
+#     python headless.py --collectors cpu memory --interval cpu_temp=5 --output session_a
+#     python headless.py --rate 10 --benchmark            (負荷をすべて実行し、終わったら記録も終える)
+
+import time
+
+_started = time.perf_counter()
+
+import argparse
+import math
+import os
+import signal
+
+import psutil
+
+from collectors import COLLECTORS, MAX_SAMPLE_RATE, Sampler, build_collectors, find_collector
+from workloads import KERNELS, MAX_DEFAULT_PROCESSES, BenchmarkSuite
+from exporter import DEFAULT_SECONDS, MetricsExporter
+from writer import SessionWriter
+
+
+def parse_intervals(parser, items):
+    """["gpu=2", "cpu_temp=5"] -> {"gpu": 2.0, "cpu_temp": 5.0} (書式の誤りは parser.error で終了する)"""
+    intervals = {}
+    for item in items or []:
+        name, separator, seconds = item.partition('=')
+        if not separator or name not in COLLECTORS:
+            parser.error(f"--interval: NAME=SECONDS の形式で、NAME は {', '.join(COLLECTORS)} のいずれかです: {item}")
+        try:
+            intervals[name] = float(seconds)
+        except ValueError:
+            parser.error(f"--interval: 秒数が数値ではありません: {item}")
+        if not math.isfinite(intervals[name]) or intervals[name] < 0:
+            parser.error(f"--interval: 秒数は 0 以上の有限の値です: {item}")
+    return intervals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="画面なしでベンチマークを記録する")
+    parser.add_argument("--rate", type=float, default=1, help=f"1秒あたりのサンプル数 (最大 {MAX_SAMPLE_RATE})")
+    parser.add_argument("--duration", type=float, help="記録する秒数 (省略時は Ctrl+C まで)")
+    parser.add_argument("--collectors", nargs="+", choices=list(COLLECTORS), help="使うコレクター (省略時はすべて)")
+    parser.add_argument("--interval", nargs="+", metavar="NAME=SECONDS", help="コレクターごとの取得間隔")
+    parser.add_argument("--output", help="セッションのディレクトリ")
+    parser.add_argument("--flush", type=float, default=5.0, help="ディスクへの書き出し間隔 (秒)")
+    parser.add_argument("--benchmark", nargs="*", choices=list(KERNELS), help="記録しながら実行する負荷 (名前なしはすべて)")
+    parser.add_argument("--benchmark-duration", type=float, default=5.0, help="負荷1回あたりの実行秒数")
+    parser.add_argument("--http-port", type=int, help="計測値を公開するポート (localhost, /metrics と /window)")
+    parser.add_argument("--processes", type=int, nargs="+", help=f"負荷のプロセス数 (省略時は 1 と CPU 数、最大 {MAX_DEFAULT_PROCESSES})")
+    parser.add_argument("--workdir", help="ディスクの負荷で使うディレクトリ (省略時はセッションのディレクトリ)")
+    args = parser.parse_args(argv)
+
+    collectors = build_collectors(args.collectors, parse_intervals(parser, args.interval))
+    sampler = Sampler(collectors, 1.0 / min(args.rate, MAX_SAMPLE_RATE))
+    writer = SessionWriter(sampler.columns, args.output, flush_interval=args.flush)
+
+    exporter = None
+    if args.http_port is not None:
+        exporter = MetricsExporter(sampler.active_columns, int(DEFAULT_SECONDS * min(args.rate, MAX_SAMPLE_RATE)), args.http_port)
+        exporter.start()
+        print(f"http://127.0.0.1:{exporter.port}/metrics で公開中")
+
+    suite = None
+    workload = find_collector(collectors, 'workload')
+    if args.benchmark is not None and workload:
+        suite = BenchmarkSuite(args.benchmark, args.benchmark_duration, args.processes,
+                               args.workdir or writer.directory)
+        workload.suite = suite
+
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    stopped = []
+    signal.signal(signal.SIGINT, lambda *_: stopped.append(True))
+    signal.signal(signal.SIGTERM, lambda *_: stopped.append(True))
+
+    def running():
+        if suite and not suite.running:
+            return False
+        return not stopped and (deadline is None or time.perf_counter() < deadline)
+
+    count = 0
+
+    def record(sample):
+        nonlocal count
+        writer.add(sample)
+        if exporter:
+            exporter.publish(sample)
+        count += 1
+
+    startup = time.perf_counter() - _started
+    print(f"{writer.directory}: {', '.join(c.name for c in collectors)} を記録中 (起動 {startup * 1000:.0f} ms)")
+
+    process = psutil.Process()
+    cpu_before = sum(process.cpu_times()[:2])
+    begin = time.perf_counter()
+    if suite:
+        suite.start()
+    sampler.run(running, record)
+    if suite:
+        suite.cancel()
+        suite.wait()
+        suite.save(os.path.join(writer.directory, 'scores.csv'))
+        for name, processes, score, unit in suite.results:
+            print(f"{name} ({processes} プロセス): {score:.2f} {unit}")
+    writer.close()
+    if exporter:
+        exporter.stop()
+    elapsed = time.perf_counter() - begin
+
+    with process.oneshot():
+        cpu_used = sum(process.cpu_times()[:2]) - cpu_before
+        rss = process.memory_info().rss
+    print(f"{count} サンプル / {elapsed:.1f} 秒  "
+          f"自プロセスの CPU {cpu_used / max(elapsed, 1e-9) * 100:.2f}%  RSS {rss / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# 長時間のセッションをグラフに描くための多段階の集約と間引き
+#
+# 生のサンプル (RingBuffer) に加えて、TIER_FACTOR 件ずつ min / max / mean にまとめた段を
+# TIER_LEVELS 段持つ。表示範囲と画面の横幅 (ピクセル数) から使う段を選び、
+#   生のサンプル: Largest-Triangle-Three-Buckets (LTTB) でピクセル数まで間引く
+#   集約した段:   1ピクセルあたり min と max の2点にまとめる (短いスパイクも消えない)
+# ので、描く点の数はサンプル数ではなくピクセル数で決まる。
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+TIER_FACTOR = 10  # 1段上がるごとにまとめるサンプル数の倍率
+TIER_LEVELS = 5  # 10, 100, 1000, 10000, 100000 サンプルずつの段
+TIER_CAPACITY = 20_000  # 各段に保持するまとめの数
+POINTS_PER_PIXEL = 4  # この密度までは生のサンプルを LTTB で間引いて使う (超えたらまとめた段を使う)
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets で (x, y) を threshold 点に間引く
+
+    両端の点を残し、間を threshold - 2 個の区間に分けて、各区間から「前に選んだ点」と
+    「次の区間の平均」とで作る三角形の面積が最大になる点を選ぶ。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # 時刻 (ナノ秒) は先頭からの差にしてから float にする
+    fx = (x - x[0]).astype(np.float64)
+    fy = np.asarray(y, dtype=np.float64)
+    # 次の区間の平均はまとめて求めておく (最後の区間の「次」は末尾の点)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(fx[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(fy[:-1], edges[:-1]) / counts
+    next_x = np.append(mean_x[1:], fx[-1])
+    next_y = np.append(mean_y[1:], fy[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((fx[a] - next_x[i]) * (fy[start:end] - fy[a]) - (fx[a] - fx[start:end]) * (next_y[i] - fy[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return x[selected], y[selected]
+
+
+def min_max_envelope(x, low, high, pixels):
+    """集約済みの (x, min, max) を高々 pixels 区間にまとめ、区間ごとに min, max の2点を並べる"""
+    group = -(-len(x) // max(pixels, 1))
+    if group > 1:
+        trimmed = len(x) - len(x) % group
+        x = x[-trimmed:][::group]
+        low = low[-trimmed:].reshape(-1, group).min(axis=1)
+        high = high[-trimmed:].reshape(-1, group).max(axis=1)
+    return np.repeat(x, 2), np.column_stack((low, high)).ravel()
+
+
+class History:
+    """生のサンプルと、それをまとめた段から表示用の系列を作る
+
+    add() はサンプルごとに呼び、段ごとの途中の集計を進める。
+    """
+
+    def __init__(self, data, columns, factor=TIER_FACTOR, levels=TIER_LEVELS, capacity=TIER_CAPACITY):
+        self.data = data  # 生のサンプルの RingBuffer
+        self.columns = list(columns)
+        self.factor = factor
+        spec = {'timestamp': np.int64}
+        for name in self.columns:
+            spec[f'{name}_min'] = np.float32
+            spec[f'{name}_max'] = np.float32
+            spec[f'{name}_mean'] = np.float32
+        self.tiers = [RingBuffer(spec, capacity) for _ in range(levels)]
+        # 段ごとの途中の集計: [先頭の時刻, 件数, min, max, 合計]
+        self._partial = [None] * levels
+        self.first_timestamp = None
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+        self._partial = [None] * len(self.tiers)
+        self.first_timestamp = None
+
+    def add(self, sample):
+        values = np.array([sample[name] for name in self.columns], dtype=np.float64)
+        if self.first_timestamp is None:
+            self.first_timestamp = int(sample['timestamp'])
+        self._feed(0, int(sample['timestamp']), 1, values, values, values)
+
+    def _feed(self, level, timestamp, count, low, high, total):
+        partial = self._partial[level]
+        if partial is None:
+            self._partial[level] = partial = [timestamp, 0, low.copy(), high.copy(), np.zeros_like(total)]
+        else:
+            np.minimum(partial[2], low, out=partial[2])
+            np.maximum(partial[3], high, out=partial[3])
+        partial[1] += count
+        partial[4] += total
+        if partial[1] < self.factor ** (level + 1):
+            return
+
+        bucket = {'timestamp': partial[0]}
+        mean = partial[4] / partial[1]
+        for i, name in enumerate(self.columns):
+            bucket[f'{name}_min'] = partial[2][i]
+            bucket[f'{name}_max'] = partial[3][i]
+            bucket[f'{name}_mean'] = mean[i]
+        self.tiers[level].append(bucket)
+        self._partial[level] = None
+        if level + 1 < len(self.tiers):
+            self._feed(level + 1, partial[0], partial[1], partial[2], partial[3], partial[4])
+
+    def view(self, start, end, pixels):
+        """時刻 start〜end (ナノ秒) を横 pixels ピクセルで描くための {列名: (x, y)} を返す"""
+        limit = pixels * POINTS_PER_PIXEL
+        raw = self.data.latest()
+        timestamps = raw['timestamp']
+        if len(timestamps):
+            covers = timestamps[0] <= start or self.data.total == len(self.data)
+            i = np.searchsorted(timestamps, start)
+            j = np.searchsorted(timestamps, end, side='right')
+            if covers and j - i <= 2 * pixels:
+                # 1ピクセルあたり2点以下ならそのまま描く
+                return {name: (timestamps[i:j], raw[name][i:j]) for name in self.columns}
+            if covers and j - i <= limit:
+                x = timestamps[i:j]
+                return {name: lttb(x, raw[name][i:j], pixels) for name in self.columns}
+
+        # 範囲を含み、点の数が limit 以下になる最も細かい段を使う (無ければ最も粗い段)
+        chosen = None
+        for tier in self.tiers:
+            if not len(tier):
+                break
+            buckets = tier.latest()
+            timestamps = buckets['timestamp']
+            i = np.searchsorted(timestamps, start)
+            j = np.searchsorted(timestamps, end, side='right')
+            chosen = (buckets, i, j)
+            if (timestamps[0] <= start or tier.total == len(tier)) and j - i <= limit:
+                break
+        if chosen is None:
+            x = raw['timestamp']
+            return {name: lttb(x, raw[name], pixels) for name in self.columns}
+
+        buckets, i, j = chosen
+        x = buckets['timestamp'][i:j]
+        return {name: min_max_envelope(x, buckets[f'{name}_min'][i:j], buckets[f'{name}_max'][i:j], pixels)
+                for name in self.columns}
@@ -1,34 +1,70 @@
+import os
 import psutil
-import GPUtil
 import matplotlib.pyplot as plt
-import pandas as pd
 from datetime import datetime
 import threading
 import time
+from collections import deque
 import numpy as np
 import tkinter as tk
 from tkinter import ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+from collectors import MAX_SAMPLE_RATE, WORKLOAD_NAMES, Sampler, build_collectors, find_collector, get_gpu_name
+from exporter import DEFAULT_SECONDS, MetricsExporter
+from history import History
+from ring_buffer import RingBuffer
+from workloads import KERNELS, BenchmarkSuite
+from writer import SessionWriter, export_csv
+
+# 保持するサンプル数 (1秒間隔で24時間分)
+DEFAULT_WINDOW = 24 * 60 * 60
+
+# グラフに表示する系列: (軸の番号, 列名, 凡例)
+PLOT_SERIES = [
+    (0, 'cpu_usage', '使用率'),
+    (0, 'cpu_temp', '温度'),
+    (1, 'memory_usage', None),
+    (2, 'gpu_usage', None),
+    (3, 'workload_throughput', None)
+]
+PLOT_TITLES = ['CPU状態', 'メモリ使用率 (%)', 'GPU使用率 (%)', 'ベンチマークのスループット', 'コアごとの使用率 (%)']
+HEATMAP_COLUMNS = 300  # ヒートマップの横方向の最大セル数 (超える分は区間の最大値にまとめる)
+HEATMAP_SAMPLES = HEATMAP_COLUMNS * 8  # ヒートマップに使うサンプル数の上限 (超える分は間引く)
+PROCESS_COLUMNS = [('pid', 'PID', 70), ('name', '名前', 200), ('cpu', 'CPU%', 70),
+                   ('rss', 'RSS(MB)', 80), ('read', '読込(MB/s)', 90), ('write', '書込(MB/s)', 90)]
+DISPLAY_SECONDS = 30  # グラフに表示する時間幅の初期値・最小値 (秒)
+ZOOM_FACTOR = 2  # マウスホイール1段あたりの拡大率
+DEFAULT_SAMPLE_RATE = 1  # 1秒あたりのサンプル数 (最大 MAX_SAMPLE_RATE)
+UI_REFRESH_MS = 100  # 画面の更新間隔 (10Hz)。サンプリング間隔とは独立
+
 class BenchmarkMonitor:
-    def __init__(self):
+    def __init__(self, window=DEFAULT_WINDOW, sample_rate=DEFAULT_SAMPLE_RATE, collectors=None, http_port=None,
+                 workdir=None):
         try:
             self.monitoring = False
-            self.data = {
-                'timestamp': [],
-                'cpu_usage': [],
-                'cpu_freq': [],
-                'cpu_temp': [],  # CPU温度を追加
-                'memory_usage': [],
-                'memory_available': [],
-                'memory_speed': [],
-                'gpu_usage': [], 
-                'gpu_memory': [],
-                'gpu_temp': [],
-                'gpu_clock': [],
-                'frame_size': [], # フレームサイズを追加
-                'frame_rate': []  # フレームレートを追加
-            }
+            # ディスクの負荷を書くディレクトリ (省略時はセッションのディレクトリ)
+            self.workdir = workdir
+            # collectors: 使うコレクター名のリスト (省略時はこの環境で使えるものすべて)
+            self.sampler = Sampler(build_collectors(collectors), 1.0 / min(sample_rate, MAX_SAMPLE_RATE))
+            # サンプリングスレッド → UIスレッドの受け渡し (deque の append / popleft はスレッドセーフ)
+            self.samples = deque()
+            # 固定長のリングバッファに列ごとに保存する (長時間動かしてもメモリが増えない)
+            self.data = RingBuffer(self.sampler.columns, window)
+            # グラフの系列はまとめた段も持ち、長い範囲でもピクセル数ぶんの点だけを描く
+            self.history = History(self.data, [column for _, column, _ in PLOT_SERIES])
+            self.view_seconds = DISPLAY_SECONDS  # 表示する時間幅 (None はセッション全体)
+            self._view_updated = 0.0
+
+            # http_port を指定すると localhost で計測値を公開する (exporter.py)
+            self.exporter = None
+            if http_port is not None:
+                self.exporter = MetricsExporter(self.sampler.active_columns, int(DEFAULT_SECONDS * min(sample_rate, MAX_SAMPLE_RATE)), http_port)
+                self.exporter.start()
+            self.processes = find_collector(self.sampler.collectors, 'processes')
+            self._process_version = 0
+            self.workload = find_collector(self.sampler.collectors, 'workload')
+            self.suite = None
             
             # システム情報の取得
             self.system_info = {
@@ -51,16 +87,27 @@ class BenchmarkMonitor:
             
             self.stop_button = ttk.Button(self.main_frame, text="停止", command=self.stop_monitoring)
             self.stop_button.grid(row=0, column=1, padx=5)
+
+            self.benchmark_button = ttk.Button(self.main_frame, text="ベンチマーク実行", command=self.start_benchmark)
+            self.benchmark_button.grid(row=0, column=2, padx=5)
+
+            self.recent_button = ttk.Button(self.main_frame, text=f"直近{DISPLAY_SECONDS}秒",
+                                            command=lambda: self.set_view(DISPLAY_SECONDS))
+            self.recent_button.grid(row=0, column=3, padx=5)
+
+            self.whole_button = ttk.Button(self.main_frame, text="全体", command=lambda: self.set_view(None))
+            self.whole_button.grid(row=0, column=4, padx=5)
             
             # グラフ表示用のキャンバス
             plt.style.use('dark_background')  # グラフのスタイルを設定
-            self.fig, (self.ax1, self.ax2, self.ax3, self.ax4) = plt.subplots(4, 1, figsize=(10, 10))
+            self.fig, (self.ax1, self.ax2, self.ax3, self.ax4, self.ax5) = plt.subplots(5, 1, figsize=(10, 12))
             self.canvas = FigureCanvasTkAgg(self.fig, master=self.main_frame)
-            self.canvas.get_tk_widget().grid(row=1, column=0, columnspan=2, pady=10)
+            self.canvas.get_tk_widget().grid(row=1, column=0, columnspan=5, pady=10)
+            self._setup_graphs()
             
             # 数値表示用のラベル
             self.info_frame = ttk.LabelFrame(self.main_frame, text="システム情報", padding="5")
-            self.info_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E))
+            self.info_frame.grid(row=2, column=0, columnspan=5, sticky=(tk.W, tk.E))
             
             self.cpu_label = ttk.Label(self.info_frame, text="CPU使用率: ---%")
             self.cpu_label.grid(row=0, column=0, padx=5)
@@ -74,11 +121,19 @@ class BenchmarkMonitor:
             self.gpu_label = ttk.Label(self.info_frame, text="GPU使用率: ---%")
             self.gpu_label.grid(row=0, column=3, padx=5)
             
-            self.frame_label = ttk.Label(self.info_frame, text="フレームサイズ: --- MB")
-            self.frame_label.grid(row=1, column=0, padx=5)
+            self.workload_label = ttk.Label(self.info_frame, text="ベンチマーク: ---")
+            self.workload_label.grid(row=1, column=0, padx=5)
             
-            self.fps_label = ttk.Label(self.info_frame, text="フレームレート: --- FPS")
-            self.fps_label.grid(row=1, column=1, padx=5)
+            self.throughput_label = ttk.Label(self.info_frame, text="スループット: ---")
+            self.throughput_label.grid(row=1, column=1, padx=5)
+
+            # CPU使用率の高いプロセスの一覧
+            self.process_table = ttk.Treeview(self.main_frame, columns=[c for c, _, _ in PROCESS_COLUMNS],
+                                              show='headings', height=8)
+            for column, heading, width in PROCESS_COLUMNS:
+                self.process_table.heading(column, text=heading)
+                self.process_table.column(column, width=width, anchor=tk.W if column == 'name' else tk.E)
+            self.process_table.grid(row=3, column=0, columnspan=5, sticky=(tk.W, tk.E), pady=5)
 
             # ウィンドウサイズの調整を許可
             self.root.resizable(True, True)
@@ -102,144 +157,250 @@ class BenchmarkMonitor:
         return f"{memory.total / (1024**3):.1f}GB"
 
     def _get_gpu_name(self):
-        try:
-            gpu = GPUtil.getGPUs()[0]
-            return gpu.name
-        except:
-            return "Unknown GPU"
+        return get_gpu_name()
 
     def start_monitoring(self):
+        # サンプルはバックグラウンドで数秒ごとにセッションのディレクトリへ追記する
+        self.writer = SessionWriter(self.sampler.columns)
         self.monitoring = True
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.daemon = True  # メインスレッド終了時に監視スレッドも終了
         self.monitor_thread.start()
+        self._drain_job = self.root.after(UI_REFRESH_MS, self._drain_samples)
+
+    def start_benchmark(self):
+        """ベンチマークの負荷を順に実行し、システムの計測と同じセッションに記録する"""
+        if self.workload is None or (self.suite and self.suite.running):
+            return
+        if not self.monitoring:
+            self.start_monitoring()
+        self.suite = BenchmarkSuite(workdir=self.workdir or self.writer.directory)
+        self.workload.suite = self.suite
+        self.suite.start()
 
     def stop_monitoring(self):
+        if self.suite and self.suite.running:
+            self.suite.cancel()
+            self.suite.wait()
         self.monitoring = False
         if hasattr(self, 'monitor_thread'):
             self.monitor_thread.join()
+        if getattr(self, '_drain_job', None):
+            self.root.after_cancel(self._drain_job)
+            self._drain_job = None
+        self._drain_samples()
         self.save_results()
 
     def _monitor_loop(self):
-        while self.monitoring:
-            try:
-                # システム情報の取得
-                timestamp = datetime.now()
-                
-                # CPU情報
-                cpu_freq = psutil.cpu_freq()
-                cpu_usage = psutil.cpu_percent(percpu=True)
-                
-                # CPU温度の取得
-                try:
-                    temps = psutil.sensors_temperatures()
-                    if 'coretemp' in temps:
-                        cpu_temp = temps['coretemp'][0].current
-                    else:
-                        cpu_temp = 0
-                except:
-                    cpu_temp = 0
-                
-                # メモリ情報
-                memory = psutil.virtual_memory()
-                swap = psutil.swap_memory()
-                
-                # GPU情報
-                gpu = GPUtil.getGPUs()[0]
-
-                # フレーム情報の取得（サンプル値）
-                frame_size = np.random.normal(50, 5)  # 平均50MB、標準偏差5MBのサンプルデータ
-                frame_rate = np.random.normal(60, 2)  # 平均60FPS、標準偏差2FPSのサンプルデータ
-
-                # データの保存
-                self.data['timestamp'].append(timestamp)
-                
-                # CPU詳細データ
-                cpu_usage_avg = np.mean(cpu_usage)
-                self.data['cpu_usage'].append(cpu_usage_avg)
-                self.data['cpu_freq'].append(cpu_freq.current)
-                self.data['cpu_temp'].append(cpu_temp)
-                
-                # メモリ詳細データ
-                self.data['memory_usage'].append(memory.percent)
-                self.data['memory_available'].append(memory.available / (1024 * 1024 * 1024))
-                self.data['memory_speed'].append(swap.used / (1024 * 1024))
-                
-                # GPU詳細データ
-                gpu_usage = gpu.load * 100
-                self.data['gpu_usage'].append(gpu_usage)
-                self.data['gpu_memory'].append(gpu.memoryUsed)
-                self.data['gpu_temp'].append(gpu.temperature)
-                # GPUクロック情報は利用できないため0を設定
-                self.data['gpu_clock'].append(0)
-                
-                # フレーム詳細データ
-                self.data['frame_size'].append(frame_size)
-                self.data['frame_rate'].append(frame_rate)
-
-                # UI更新
-                self.root.after(0, self._update_ui, cpu_usage_avg, cpu_temp, memory.percent, gpu_usage, frame_size, frame_rate)
-                
-                time.sleep(1)
-            except Exception as e:
-                print(f"モニタリングエラー: {str(e)}")
-                time.sleep(1)
-
-    def _update_ui(self, cpu_usage, cpu_temp, memory_usage, gpu_usage, frame_size, frame_rate):
+        self.sampler.run(lambda: self.monitoring, self._on_sample)
+
+    def _on_sample(self, sample):
+        self.writer.add(sample)
+        self.samples.append(sample)
+        if self.exporter:
+            self.exporter.publish(sample)
+
+    def _drain_samples(self):
+        """溜まったサンプルをまとめてリングバッファに移し、画面を1回だけ更新する (UIスレッドで定期実行)"""
+        latest = None
+        while self.samples:
+            latest = self.samples.popleft()
+            self.data.append(latest)
+            self.history.add(latest)
+        if latest is not None:
+            self._update_ui(latest['cpu_usage'], latest['cpu_temp'], latest['memory_usage'],
+                            latest['gpu_usage'], latest['workload'], latest['workload_throughput'])
+        if self.processes and self.processes.version != self._process_version:
+            self._update_process_table()
+        if self.suite and not self.suite.running and self.workload.suite is self.suite:
+            self._save_scores()
+        if self.monitoring:
+            self._drain_job = self.root.after(UI_REFRESH_MS, self._drain_samples)
+
+    def _save_scores(self):
+        """ベンチマークが終わったらスコアをセッションのディレクトリに保存する"""
+        self.workload.suite = None
+        try:
+            self.suite.save(os.path.join(self.writer.directory, 'scores.csv'))
+            for name, count, score, unit in self.suite.results:
+                print(f"{name} ({count} プロセス): {score:.2f} {unit}")
+        except Exception as e:
+            print(f"スコア保存エラー: {str(e)}")
+
+    def _update_ui(self, cpu_usage, cpu_temp, memory_usage, gpu_usage, workload, throughput):
         try:
             # ラベル更新
             self.cpu_label.config(text=f"CPU使用率: {cpu_usage:.1f}%")
             self.cpu_temp_label.config(text=f"CPU温度: {cpu_temp:.1f}°C")
             self.memory_label.config(text=f"メモリ使用率: {memory_usage:.1f}%")
             self.gpu_label.config(text=f"GPU使用率: {gpu_usage:.1f}%")
-            self.frame_label.config(text=f"フレームサイズ: {frame_size:.1f} MB")
-            self.fps_label.config(text=f"フレームレート: {frame_rate:.1f} FPS")
+            if workload:
+                name = WORKLOAD_NAMES[int(workload) - 1]
+                self.workload_label.config(text=f"ベンチマーク: {name}")
+                self.throughput_label.config(text=f"スループット: {throughput:.2f} {KERNELS[name].unit}")
+            else:
+                self.workload_label.config(text="ベンチマーク: ---")
+                self.throughput_label.config(text="スループット: ---")
             
             # グラフ更新
             self._update_graphs()
         except Exception as e:
             print(f"UI更新エラー: {str(e)}")
         
+    def _update_process_table(self):
+        """プロセス一覧を最新の上位 N 件で置き換える"""
+        self._process_version = self.processes.version
+        self.process_table.delete(*self.process_table.get_children())
+        for pid, name, cpu, rss, read, write in self.processes.table:
+            self.process_table.insert('', tk.END, values=(pid, name, f"{cpu:.1f}", f"{rss:.1f}",
+                                                          f"{read:.2f}", f"{write:.2f}"))
+
+    def _setup_graphs(self):
+        """グラフの線を1度だけ作成する (以降は set_data とブリッティングで更新)"""
+        self.axes = (self.ax1, self.ax2, self.ax3, self.ax4, self.ax5)
+        self.lines = {}
+        self.axis_lines = [[] for _ in self.axes]
+        for ax_index, column, label in PLOT_SERIES:
+            line, = self.axes[ax_index].plot([], [], label=label, animated=True)
+            self.lines[column] = line
+            self.axis_lines[ax_index].append(line)
+
+        # コアごとの使用率のヒートマップ (縦: コア番号, 横: 経過時間)
+        self.heatmap = None
+        if 'core_usage' in self.data.columns:
+            cores = self.data.column('core_usage').shape[1]
+            self.heatmap = self.ax5.imshow(np.zeros((cores, 1)), aspect='auto', origin='lower', cmap='inferno',
+                                           vmin=0, vmax=100, interpolation='nearest', animated=True,
+                                           extent=(-DISPLAY_SECONDS, 0, 0, cores))
+            self.axis_lines[4].append(self.heatmap)
+
+        # 横軸は「最新のサンプルからの経過秒」で固定し、軸の再描画を不要にする
+        for ax, title in zip(self.axes, PLOT_TITLES):
+            ax.set_title(title)
+            ax.set_xlim(-DISPLAY_SECONDS, 0)
+            ax.set_ylim(0, 100)
+        self.ax5.set_ylim(0, self.heatmap.get_array().shape[0] if self.heatmap else 1)
+        self.ax5.set_ylabel('コア')
+        self.ax5.set_xlabel('経過時間 (秒)')
+        self.ax1.legend(loc='upper left')
+
+        self._xlim = DISPLAY_SECONDS
+        self._backgrounds = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('scroll_event', self._on_scroll)
+
+    def set_view(self, seconds):
+        """表示する時間幅を変える (None はセッション全体)"""
+        self.view_seconds = seconds
+        self._view_updated = 0.0
+        self._update_graphs()
+
+    def _on_scroll(self, event):
+        """マウスホイールで時間幅を拡大・縮小する (直近 DISPLAY_SECONDS 秒〜セッション全体)"""
+        if not len(self.data):
+            return
+        whole = self._session_seconds()
+        current = self.view_seconds or whole
+        seconds = current / ZOOM_FACTOR if event.button == 'up' else current * ZOOM_FACTOR
+        self.set_view(None if seconds >= whole else max(seconds, DISPLAY_SECONDS))
+
+    def _session_seconds(self):
+        latest = self.data.column('timestamp', 1)[0]
+        return max((latest - self.history.first_timestamp) / 1e9, DISPLAY_SECONDS)
+
+    def _set_xlim(self, span):
+        """横軸の幅を表示範囲に合わせる (セッション全体の表示では広げるときだけ変える)"""
+        width = span
+        if self.view_seconds is None:
+            width = self._xlim if span <= self._xlim else span * 1.25
+        if width != self._xlim:
+            self._xlim = width
+            for ax in self.axes:
+                ax.set_xlim(-width, 0)
+            self._backgrounds = None
+
+    def _on_draw(self, event):
+        """全体の再描画後に、線を除いた背景を保存しておく"""
+        self._backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        for ax, lines in zip(self.axes, self.axis_lines):
+            for line in lines:
+                ax.draw_artist(line)
+
+    def _rescale(self):
+        """値が現在の表示範囲から外れた軸だけ縦軸を広げる (広げた場合は True)"""
+        rescaled = False
+        for ax, lines in zip(self.axes, self.axis_lines):
+            values = [line.get_ydata() for line in lines if hasattr(line, 'get_ydata') and len(line.get_ydata())]
+            if not values:
+                continue
+            low = min(float(np.min(v)) for v in values)
+            high = max(float(np.max(v)) for v in values)
+            bottom, top = ax.get_ylim()
+            if low < bottom or high > top:
+                margin = (high - low) * 0.1 or 1.0
+                ax.set_ylim(min(bottom, low - margin), max(top, high + margin))
+                rescaled = True
+        return rescaled
+
     def _update_graphs(self):
         try:
-            if len(self.data['timestamp']) > 0:
-                self.ax1.clear()
-                self.ax2.clear()
-                self.ax3.clear()
-                self.ax4.clear()
-                
-                # 直近30点のデータを表示
-                display_points = 30
-                start_idx = max(0, len(self.data['timestamp']) - display_points)
-                
-                # CPU使用率と温度を同じグラフに表示
-                self.ax1.plot(self.data['timestamp'][start_idx:], self.data['cpu_usage'][start_idx:], label='使用率')
-                self.ax1.plot(self.data['timestamp'][start_idx:], self.data['cpu_temp'][start_idx:], label='温度')
-                self.ax1.set_title('CPU状態')
-                self.ax1.legend()
-                
-                self.ax2.plot(self.data['timestamp'][start_idx:], self.data['memory_usage'][start_idx:])
-                self.ax2.set_title('メモリ使用率 (%)')
-                
-                self.ax3.plot(self.data['timestamp'][start_idx:], self.data['gpu_usage'][start_idx:])
-                self.ax3.set_title('GPU使用率 (%)')
-                
-                # フレーム情報のグラフを追加
-                self.ax4.plot(self.data['timestamp'][start_idx:], self.data['frame_size'][start_idx:], label='フレームサイズ(MB)')
-                self.ax4.plot(self.data['timestamp'][start_idx:], self.data['frame_rate'][start_idx:], label='FPS')
-                self.ax4.set_title('フレーム情報')
-                self.ax4.legend()
-                
-                self.fig.autofmt_xdate()
-                self.canvas.draw()
+            if len(self.data) > 0:
+                recent = self.data.latest()
+                timestamps = recent['timestamp']
+                end = timestamps[-1]
+                span = self.view_seconds or self._session_seconds()
+                self._set_xlim(span)
+
+                # 長い範囲では、新しいサンプルが1ピクセル分たまるまで線を作り直さない
+                pixels = max(int(self.ax1.bbox.width), 100)
+                now = time.perf_counter()
+                if self._backgrounds is None or now - self._view_updated >= span / pixels:
+                    self._view_updated = now
+                    start = end - int(span * 1_000_000_000)
+                    for column, (x, y) in self.history.view(start, end, pixels).items():
+                        self.lines[column].set_data((x - end) / 1e9, y)
+                    if self.heatmap is not None:
+                        first = np.searchsorted(timestamps, start)
+                        self._update_heatmap(recent['core_usage'][first:], (timestamps[first] - end) / 1e9)
+
+                if self._rescale() or self._backgrounds is None:
+                    # 軸が変わったときだけ全体を描き直す (draw_event で背景を保存し直す)
+                    self.canvas.draw()
+                else:
+                    # 背景を戻して線だけを描き、変化した軸の領域だけ転送する
+                    for ax, lines, background in zip(self.axes, self.axis_lines, self._backgrounds):
+                        self.canvas.restore_region(background)
+                        for line in lines:
+                            ax.draw_artist(line)
+                        self.canvas.blit(ax.bbox)
         except Exception as e:
             print(f"グラフ更新エラー: {str(e)}")
 
+    def _update_heatmap(self, core_usage, first):
+        """(サンプル数, コア数) の使用率をヒートマップに反映する
+
+        横方向のセル数を HEATMAP_COLUMNS までに抑え、表示範囲やコア数、サンプリング周波数が大きくても描画量を一定にする。
+        区間の最大値を使うので、短い張り付きも消えない。
+        """
+        stride = -(-len(core_usage) // HEATMAP_SAMPLES)
+        if stride > 1:
+            # 範囲が長いときはサンプルを間引いてから集約する (末尾の最新サンプルは必ず含める)
+            core_usage = core_usage[(len(core_usage) - 1) % stride::stride]
+        step = -(-len(core_usage) // HEATMAP_COLUMNS)
+        if step > 1:
+            trimmed = len(core_usage) - len(core_usage) % step
+            core_usage = core_usage[-trimmed:].reshape(-1, step, core_usage.shape[1]).max(axis=1)
+        self.heatmap.set_data(core_usage.T)
+        self.heatmap.set_extent((first, 0, 0, core_usage.shape[1]))
+
     def save_results(self):
         """モニタリング結果を保存するメソッド"""
         try:
-            df = pd.DataFrame(self.data)
-            df.to_csv(f'benchmark_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv', index=False)
+            if not hasattr(self, 'writer'):
+                return
+            # 記録済みのパートを閉じて連結するだけなので、停止時にメモリを使わない
+            self.writer.close()
+            export_csv(self.writer.directory, f'benchmark_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
         except Exception as e:
             print(f"結果保存エラー: {str(e)}")
 
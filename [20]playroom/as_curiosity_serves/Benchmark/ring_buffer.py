@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def column_spec(spec):
+    """列の指定 (dtype または (dtype, 幅)) を (dtype, 1サンプルあたりの形) に変換する"""
+    if isinstance(spec, tuple):
+        dtype, width = spec
+        return np.dtype(dtype), (width,)
+    return np.dtype(spec), ()
+
+
+class RingBuffer:
+    """列ごとに型付き配列を持つ固定長のリングバッファ
+
+    各サンプルを位置 i と i + capacity の2か所に書き込むため、
+    直近 capacity 件までのどの範囲も折り返しのない連続したビューとして取り出せる。
+    """
+
+    def __init__(self, columns, capacity):
+        # columns: {列名: dtype} (コアごとの値のような2次元の列は {列名: (dtype, 幅)})
+        self.capacity = capacity
+        self.columns = dict(columns)
+        self._arrays = {}
+        for name, spec in self.columns.items():
+            dtype, shape = column_spec(spec)
+            self._arrays[name] = np.zeros((2 * capacity,) + shape, dtype=dtype)
+        self._head = 0  # 次に書き込む位置 (0..capacity-1)
+        self._count = 0
+        self.total = 0  # これまでに追加された総サンプル数
+
+    def __len__(self):
+        return self._count
+
+    def append(self, sample):
+        """1サンプル (列名 -> 値) を追加する。古いサンプルは上書きされる"""
+        i = self._head
+        j = i + self.capacity
+        for name, array in self._arrays.items():
+            value = sample.get(name, 0)
+            array[i] = value
+            array[j] = value
+        self._head = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self.total += 1
+
+    def latest(self, n=None):
+        """直近 n 件 (省略時は保持している全件) を {列名: ビュー} で返す (コピーなし)"""
+        n = self._count if n is None else min(n, self._count)
+        end = self._head + self.capacity
+        return {name: array[end - n:end] for name, array in self._arrays.items()}
+
+    def column(self, name, n=None):
+        """1列分の直近 n 件のビュー"""
+        return self.latest(n)[name]
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self.total = 0
@@ -0,0 +1,356 @@
+# ベンチマーク用の負荷 (カーネル) とその実行
+#
+# 各カーネルは一定量の処理を行う step() を繰り返し、処理量からスループットを求める。
+# 実行は常に別プロセスで行い (GIL を奪わないので計測や画面の更新を妨げない)、
+# プロセス数を変えて単一プロセス・複数プロセスの両方を測る。
+# ワーカーの BLAS は1スレッドに固定し (プロセス数より多くのスレッドで CPU を奪い合わないように)、
+# プロセス数の既定は MAX_DEFAULT_PROCESSES までにする (メモリとディスクを使う量がコア数に比例するため)。
+# ディスクの負荷は workdir (既定はカレントディレクトリ) に書く。/tmp は tmpfs (メモリ) のことがあるので、
+# 測りたいディスク上のディレクトリを指定する。
+# 例: python workloads.py --duration 5
+#     python workloads.py --kernels matmul disk_seq --processes 1 4
+
+import argparse
+import math
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+REPORT_INTERVAL = 0.2  # ワーカーがスループットを報告する間隔 (秒)
+MAX_DEFAULT_PROCESSES = 8  # プロセス数を指定しない場合の上限
+# ワーカーの起動時に 1 にする BLAS / OpenMP のスレッド数の環境変数
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                         'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# 名前 -> カーネルのクラス
+KERNELS = {}
+
+
+def register_kernel(cls):
+    """カーネルを登録するデコレーター"""
+    KERNELS[cls.name] = cls
+    return cls
+
+
+class Kernel:
+    """負荷の基底クラス
+
+    step() は1回分の処理を行い、その処理量 (unit を scale で割る前の値) を返す。
+    """
+
+    name = None
+    unit = None
+    scale = 1.0
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+
+    def step(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+@register_kernel
+class CpuIntKernel(Kernel):
+    name = 'cpu_int'
+    unit = 'Mops/s'
+    scale = 1e6
+
+    def step(self):
+        x = 1
+        for _ in range(100_000):
+            x = (x * 1103515245 + 12345) & 0x7FFFFFFF
+        return 100_000
+
+
+@register_kernel
+class CpuFloatKernel(Kernel):
+    name = 'cpu_float'
+    unit = 'Mops/s'
+    scale = 1e6
+
+    def step(self):
+        x = 1.0
+        sqrt = math.sqrt
+        for _ in range(100_000):
+            x = sqrt(x * 1.000001 + 0.5)
+        return 100_000
+
+
+@register_kernel
+class MatmulKernel(Kernel):
+    name = 'matmul'
+    unit = 'GFLOPS'
+    scale = 1e9
+    SIZE = 512
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        rng = np.random.default_rng(0)
+        self.a = rng.random((self.SIZE, self.SIZE))
+        self.b = rng.random((self.SIZE, self.SIZE))
+        self.out = np.empty_like(self.a)
+
+    def step(self):
+        np.matmul(self.a, self.b, out=self.out)
+        return 2 * self.SIZE ** 3
+
+
+@register_kernel
+class MemoryBandwidthKernel(Kernel):
+    name = 'mem_bandwidth'
+    unit = 'GB/s'
+    scale = 1e9
+    BYTES = 64 * 1024 * 1024  # キャッシュに収まらない大きさ
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        self.src = np.ones(self.BYTES // 8)
+        self.dst = np.empty_like(self.src)
+
+    def step(self):
+        np.copyto(self.dst, self.src)
+        return 2 * self.BYTES  # 読み込み + 書き込み
+
+
+@register_kernel
+class MemoryRandomKernel(Kernel):
+    """キャッシュに収まらない配列からのランダムな読み出し (アクセス数/秒)"""
+
+    name = 'mem_random'
+    unit = 'Maccess/s'
+    scale = 1e6
+    BYTES = 128 * 1024 * 1024
+    BATCH = 1 << 20
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        self.data = np.ones(self.BYTES // 8)
+        self.rng = np.random.default_rng(0)
+        self.index = np.empty(self.BATCH, dtype=np.int64)
+        self.out = np.empty(self.BATCH)
+
+    def step(self):
+        self.index[:] = self.rng.integers(0, len(self.data), self.BATCH)
+        np.take(self.data, self.index, out=self.out)
+        return self.BATCH
+
+
+class _FileKernel(Kernel):
+    FILE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        fd, self.path = tempfile.mkstemp(prefix='bench_', dir=workdir)
+        self.fd = fd
+        os.ftruncate(fd, self.FILE_BYTES)
+
+    def close(self):
+        os.close(self.fd)
+        os.remove(self.path)
+
+
+@register_kernel
+class DiskSequentialKernel(_FileKernel):
+    """1MB 単位の順次書き込み + fsync と、キャッシュを捨てた上での順次読み込み"""
+
+    name = 'disk_seq'
+    unit = 'MB/s'
+    scale = 1e6
+    BLOCK = 1024 * 1024
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        self.block = os.urandom(self.BLOCK)
+
+    def step(self):
+        blocks = self.FILE_BYTES // self.BLOCK
+        for i in range(blocks):
+            os.pwrite(self.fd, self.block, i * self.BLOCK)
+        os.fsync(self.fd)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(self.fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        for i in range(blocks):
+            os.pread(self.fd, self.BLOCK, i * self.BLOCK)
+        return 2 * self.FILE_BYTES
+
+
+@register_kernel
+class DiskRandomKernel(_FileKernel):
+    """4KB 単位のランダム書き込み (BATCH 回ごとに fsync)"""
+
+    name = 'disk_random'
+    unit = 'IOPS'
+    BLOCK = 4096
+    BATCH = 64
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        self.block = os.urandom(self.BLOCK)
+        self.rng = random.Random(0)
+        self.blocks = self.FILE_BYTES // self.BLOCK
+
+    def step(self):
+        for _ in range(self.BATCH):
+            os.pwrite(self.fd, self.block, self.rng.randrange(self.blocks) * self.BLOCK)
+        os.fsync(self.fd)
+        return self.BATCH
+
+
+def _worker(worker_id, name, duration, workdir, reports):
+    """ワーカープロセス: カーネルを duration 秒繰り返し、REPORT_INTERVAL ごとに処理量を報告する"""
+    kernel = KERNELS[name](workdir)
+    try:
+        start = last = time.perf_counter()
+        done = 0
+        while True:
+            done += kernel.step()
+            now = time.perf_counter()
+            if now - last >= REPORT_INTERVAL or now - start >= duration:
+                reports.put((worker_id, done, now - last))
+                done = 0
+                last = now
+            if now - start >= duration:
+                break
+    finally:
+        kernel.close()
+        reports.put((worker_id, None, None))
+
+
+class BenchmarkSuite:
+    """カーネルを順に、プロセス数を変えて実行する
+
+    実行中は current (実行中のカーネル名), processes, throughput (直近のスループット) を更新し、
+    終わるたびに results に (カーネル名, プロセス数, スコア, 単位) を追加する。
+    """
+
+    def __init__(self, kernels=None, duration=5.0, processes=None, workdir=None):
+        self.kernels = list(kernels or KERNELS)
+        self.duration = duration
+        self.process_counts = list(processes or sorted({1, min(os.cpu_count() or 1, MAX_DEFAULT_PROCESSES)}))
+        self.workdir = workdir or os.getcwd()
+        self.current = None
+        self.processes = 0
+        self.throughput = 0.0
+        self.results = []
+        self.running = False
+        self._cancel = threading.Event()
+
+    def start(self):
+        """バックグラウンドのスレッドで実行する"""
+        self.running = True
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """実行中のカーネルを打ち切り、残りを実行しない"""
+        self._cancel.set()
+
+    def wait(self):
+        self._thread.join()
+
+    def run(self):
+        self.running = True
+        try:
+            for name in self.kernels:
+                for count in self.process_counts:
+                    if self._cancel.is_set():
+                        return
+                    score = self.run_kernel(name, count)
+                    if self._cancel.is_set():
+                        return
+                    self.results.append((name, count, score, KERNELS[name].unit))
+        finally:
+            self.current = None
+            self.throughput = 0.0
+            self.running = False
+
+    def run_kernel(self, name, count):
+        """カーネルを count プロセスで実行し、スコア (unit 単位のスループット) を返す"""
+        kernel = KERNELS[name]
+        context = multiprocessing.get_context('spawn')
+        reports = context.Queue()
+        workers = [context.Process(target=_worker, args=(i, name, self.duration, self.workdir, reports))
+                   for i in range(count)]
+        # spawn したプロセスは起動時の環境変数を引き継ぐので、その間だけ BLAS のスレッド数を 1 にする
+        saved = {variable: os.environ.get(variable) for variable in BLAS_THREAD_VARIABLES}
+        os.environ.update(dict.fromkeys(BLAS_THREAD_VARIABLES, '1'))
+        try:
+            for worker in workers:
+                worker.start()
+        finally:
+            for variable, value in saved.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+
+        self.current = name
+        self.processes = count
+        rates = [0.0] * count
+        total = 0
+        started = finished = None
+        running = count
+        while running and not self._cancel.is_set():
+            try:
+                worker_id, done, seconds = reports.get(timeout=1.0)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            if done is None:
+                running -= 1
+                rates[worker_id] = 0.0
+                continue
+            # 最初の報告が届いた時点から計る (プロセスの起動と準備の時間は含めない)
+            if started is None:
+                started = time.perf_counter() - seconds
+            # 最後の報告が届いた時点までを計る (後片付けとプロセスの終了の時間は含めない)
+            finished = time.perf_counter()
+            total += done
+            rates[worker_id] = done / seconds / kernel.scale if seconds else 0.0
+            self.throughput = sum(rates)
+
+        for worker in workers:
+            if self._cancel.is_set():
+                worker.terminate()
+            worker.join()
+        elapsed = finished - started if started else 0.0
+        return total / elapsed / kernel.scale if elapsed else 0.0
+
+    def save(self, path):
+        """スコアを CSV に書き出す"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('kernel,processes,score,unit\n')
+            for name, count, score, unit in self.results:
+                f.write(f'{name},{count},{score:.6g},{unit}\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ベンチマークの負荷を実行してスコアを表示する")
+    parser.add_argument("--kernels", nargs="+", choices=list(KERNELS), help="実行するカーネル (省略時はすべて)")
+    parser.add_argument("--duration", type=float, default=5.0, help="1回あたりの実行秒数")
+    parser.add_argument("--processes", type=int, nargs="+",
+                        help=f"プロセス数 (省略時は 1 と CPU 数、ただし最大 {MAX_DEFAULT_PROCESSES})")
+    parser.add_argument("--workdir", help="ディスクの負荷で使うディレクトリ (省略時はカレントディレクトリ)")
+    parser.add_argument("--output", help="スコアを書き出す CSV")
+    args = parser.parse_args(argv)
+
+    suite = BenchmarkSuite(args.kernels, args.duration, args.processes, args.workdir)
+    suite.run()
+    for name, count, score, unit in suite.results:
+        print(f"{name:14s} {count:3d} プロセス  {score:10.2f} {unit}")
+    if args.output:
+        suite.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
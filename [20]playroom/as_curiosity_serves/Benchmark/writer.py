@@ -0,0 +1,215 @@
+# ベンチマーク結果のストリーム書き出し
+#
+# サンプルを溜めておき、バックグラウンドのスレッドが数秒ごとに CSV と列指向バイナリへ追記する。
+# ファイルはサイズまたは時間で part_0000, part_0001, ... と切り替え、異常終了した場合も
+# 書き出し済みのブロックまでは recover_session() で復旧できる。
+# 例: python writer.py benchmark_session_20240101_120000
+
+import glob
+import json
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from ring_buffer import column_spec
+
+# 列指向バイナリ形式
+#   ファイル先頭: MAGIC + ヘッダ長(u32) + スキーマ(JSON: [[列名, dtype, 1行あたりの形], ...])
+#   ブロック:     BLOCK_MAGIC + 行数(u32) + 列ごとの配列 (スキーマ順, リトルエンディアン)
+# コアごとの値のような幅のある列は、CSV では 列名_0, 列名_1, ... に展開する
+MAGIC = b"BMON"
+BLOCK_MAGIC = b"BLK1"
+_U32 = struct.Struct("<I")
+
+
+class SessionWriter:
+    """サンプルをバックグラウンドで数秒ごとにまとめてディスクへ追記するライター
+
+    CSV と列指向バイナリの両方に書き出し、サイズまたは時間でファイルを切り替える。
+    メモリに溜まるのは前回の書き出し以降のサンプルだけなので、セッションが長くても一定。
+    """
+
+    def __init__(self, columns, directory=None, flush_interval=5.0,
+                 max_bytes=64 * 1024 * 1024, max_seconds=60 * 60):
+        self.columns = dict(columns)
+        self.specs = {}
+        for name, spec in self.columns.items():
+            dtype, shape = column_spec(spec)
+            self.specs[name] = (dtype.newbyteorder('<'), shape)
+        self.directory = directory or f'benchmark_session_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._pending = deque()  # append / popleft はスレッドセーフ
+        self._part = len(glob.glob(os.path.join(self.directory, 'part_*.bin')))
+        self._csv = None
+        self._bin = None
+        self._stop = threading.Event()
+        self._open_part()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, sample):
+        """1サンプル (列名 -> 値) を書き出し待ちに追加する"""
+        self._pending.append(sample)
+
+    def close(self):
+        """残りを書き出してファイルを閉じる"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self._flush()
+        self._csv.close()
+        self._bin.close()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"書き出しエラー: {str(e)}")
+
+    def _open_part(self):
+        base = os.path.join(self.directory, f'part_{self._part:04d}')
+        self._opened_at = time.monotonic()
+        self._csv = open(base + '.csv', 'w', encoding='utf-8', newline='')
+        self._csv.write(','.join(header for name in self.columns for header in csv_headers(name, self.specs[name][1])) + '\n')
+        self._bin = open(base + '.bin', 'wb')
+        schema = json.dumps([[name, dtype.str, list(shape)] for name, (dtype, shape) in self.specs.items()]).encode('utf-8')
+        self._bin.write(MAGIC + _U32.pack(len(schema)) + schema)
+        self._part += 1
+
+    def _rotate_if_needed(self):
+        too_big = self._bin.tell() + self._csv.tell() >= self.max_bytes
+        too_old = time.monotonic() - self._opened_at >= self.max_seconds
+        if too_big or too_old:
+            self._csv.close()
+            self._bin.close()
+            self._open_part()
+
+    def _flush(self):
+        rows = []
+        while self._pending:
+            rows.append(self._pending.popleft())
+        if not rows:
+            return
+
+        arrays = {}
+        for name, (dtype, shape) in self.specs.items():
+            if shape:
+                arrays[name] = np.zeros((len(rows),) + shape, dtype=dtype)
+                for i, row in enumerate(rows):
+                    arrays[name][i] = row.get(name, 0)
+            else:
+                arrays[name] = np.fromiter((row.get(name, 0) for row in rows), dtype=dtype, count=len(rows))
+
+        # バイナリ: 1ブロックを一度に書く (途中で落ちても読み込み時に末尾の欠けたブロックを捨てる)
+        block = [BLOCK_MAGIC, _U32.pack(len(rows))] + [arrays[name].tobytes() for name in self.specs]
+        self._bin.write(b''.join(block))
+
+        # CSV
+        text_columns = [column for name in self.columns for column in format_columns(name, arrays[name])]
+        self._csv.write(''.join(','.join(values) + '\n' for values in zip(*text_columns)))
+
+        for f in (self._bin, self._csv):
+            f.flush()
+            os.fsync(f.fileno())
+        self._rotate_if_needed()
+
+
+def csv_headers(name, shape):
+    """CSV の見出し (幅のある列は 列名_0, 列名_1, ...)"""
+    if shape:
+        return [f'{name}_{i}' for i in range(shape[0])]
+    return [name]
+
+
+def format_columns(name, values):
+    """CSV 用に1列を文字列の列のリストにする (timestamp はローカル時刻の文字列)"""
+    if name == 'timestamp':
+        return [[s.replace('T', ' ') for s in np.datetime_as_string(values.view('datetime64[ns]'), unit='us')]]
+    if values.ndim == 2:
+        return list(values.T.astype(str))
+    return [values.astype(str)]
+
+
+def read_binary(path):
+    """バイナリのパートを読み込み {列名: 配列} を返す (末尾の欠けたブロックは無視)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"ベンチマークのセッションファイルではありません: {path}")
+    (schema_length,) = _U32.unpack_from(data, 4)
+    offset = 8 + schema_length
+    schema = [(name, np.dtype(dtype), tuple(shape)) for name, dtype, shape in json.loads(data[8:offset])]
+    row_size = sum(dtype.itemsize * int(np.prod(shape)) for _, dtype, shape in schema)
+
+    chunks = {name: [] for name, _, _ in schema}
+    valid_end = offset
+    while offset + 8 <= len(data) and data[offset:offset + 4] == BLOCK_MAGIC:
+        (rows,) = _U32.unpack_from(data, offset + 4)
+        end = offset + 8 + rows * row_size
+        if end > len(data):
+            break
+        position = offset + 8
+        for name, dtype, shape in schema:
+            count = rows * int(np.prod(shape))
+            chunks[name].append(np.frombuffer(data, dtype=dtype, count=count, offset=position).reshape((rows,) + shape))
+            position += count * dtype.itemsize
+        offset = valid_end = end
+    columns = {name: np.concatenate(parts) if parts else np.empty((0,) + shape, dtype=dtype)
+               for (name, dtype, shape), parts in zip(schema, chunks.values())}
+    return columns, valid_end
+
+
+def recover_session(directory):
+    """クラッシュしたセッションを修復する
+
+    各パートの末尾にある書きかけのブロック・行を切り詰め、全パートを結合した {列名: 配列} を返す。
+    """
+    merged = {}
+    for path in sorted(glob.glob(os.path.join(directory, 'part_*.bin'))):
+        columns, valid_end = read_binary(path)
+        if valid_end < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(valid_end)
+        csv_path = path[:-4] + '.csv'
+        if os.path.exists(csv_path):
+            with open(csv_path, 'r+b') as f:
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+        for name, values in columns.items():
+            merged.setdefault(name, []).append(values)
+    return {name: np.concatenate(parts) for name, parts in merged.items()}
+
+
+def export_csv(directory, path):
+    """セッションの CSV パートを1つの CSV に連結する (ストリームでコピーするのでメモリを使わない)"""
+    parts = sorted(glob.glob(os.path.join(directory, 'part_*.csv')))
+    with open(path, 'wb') as out:
+        for index, part in enumerate(parts):
+            with open(part, 'rb') as f:
+                header = f.readline()
+                if index == 0:
+                    out.write(header)
+                shutil.copyfileobj(f, out)
+    return path
+
+
+if __name__ == "__main__":
+    session = sys.argv[1]
+    data = recover_session(session)
+    count = len(next(iter(data.values()))) if data else 0
+    output = sys.argv[2] if len(sys.argv) > 2 else f'{session.rstrip(os.sep)}.csv'
+    export_csv(session, output)
+    print(f"{session}: {count} サンプルを復旧し {output} に書き出しました")
@@ -0,0 +1,222 @@
+# 数独の一括生成 (ヘッドレス)
+#
+# プロセスプールで問題を生成し、完成したものから JSON Lines ファイルに追記していく。
+# 例: python batch.py --count 1000 --output puzzles.jsonl --resume
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from generator import DIFFICULTY_LEVELS, SOLVER_ENGINE, SOLVER_ENGINES, generate_graded, generate_sudoku, remove_numbers
+
+# 盤面の対称変換 (回転・反転の8通り) を (row, col) -> (row, col) の対応表で持つ
+_DIHEDRAL = [
+    lambda r, c: (r, c),
+    lambda r, c: (c, 8 - r),
+    lambda r, c: (8 - r, 8 - c),
+    lambda r, c: (8 - c, r),
+    lambda r, c: (r, 8 - c),
+    lambda r, c: (8 - r, c),
+    lambda r, c: (c, r),
+    lambda r, c: (8 - c, 8 - r),
+]
+_PERMS3 = [(0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)]
+
+
+def _build_transforms():
+    """ 対称変換 × バンド入れ替え × スタック入れ替え の各変換をセル番号の並びとして作る """
+    transforms = []
+    for sym in _DIHEDRAL:
+        for bands in _PERMS3:
+            for stacks in _PERMS3:
+                order = []
+                for r in range(9):
+                    for c in range(9):
+                        sr = bands[r // 3] * 3 + r % 3
+                        sc = stacks[c // 3] * 3 + c % 3
+                        tr, tc = sym(sr, sc)
+                        order.append(tr * 9 + tc)
+                transforms.append(order)
+    return transforms
+
+
+_TRANSFORMS = _build_transforms()
+
+
+def board_to_string(board):
+    """ 盤面を81文字の文字列に変換 (空きマスは '.') """
+    return "".join(str(num) if num else "." for row in board for num in row)
+
+
+def canonical_form(puzzle):
+    """ 重複判定用の正規形を返す
+
+    回転・反転・バンド/スタックの入れ替えと数字の付け替えで移り合う問題は同じ文字列になる。
+    (行・列のバンド内入れ替えまでは考慮しない簡易版)
+    """
+    best = None
+    for order in _TRANSFORMS:
+        relabel = {}
+        chars = []
+        for i in order:
+            ch = puzzle[i]
+            if ch != ".":
+                if ch not in relabel:
+                    relabel[ch] = str(len(relabel) + 1)
+                ch = relabel[ch]
+            chars.append(ch)
+        candidate = "".join(chars)
+        if best is None or candidate < best:
+            best = candidate
+    return best
+
+
+def generate_one(seed, difficulty, engine=SOLVER_ENGINE, graded=False):
+    """ シードから1問生成する (ワーカープロセスで実行)
+
+    graded=True の場合は手筋による難易度判定が difficulty と一致する問題を作り、
+    作れなかった場合は None を返す。
+    """
+    rng = random.Random(seed)
+    if graded:
+        generated = generate_graded(difficulty, engine=engine, rng=rng)
+        if generated is None:
+            return None
+        solution, puzzle = generated
+    else:
+        solution = generate_sudoku(engine=engine, rng=rng)
+        puzzle = remove_numbers(solution, difficulty, engine=engine, rng=rng)
+    puzzle = board_to_string(puzzle)
+    return {
+        "seed": seed,
+        "difficulty": difficulty,
+        "puzzle": puzzle,
+        "solution": board_to_string(solution),
+        "canonical": canonical_form(puzzle),
+    }
+
+
+def load_existing(path):
+    """ 既存の出力を読み込み、(難易度ごとの件数, 正規形の集合, 最大シード) を返す
+
+    クラッシュで最終行が途中までしか書かれていない場合は、その行を切り捨てる。
+    """
+    counts = {}
+    seen = set()
+    max_seed = -1
+    if not os.path.exists(path):
+        return counts, seen, max_seed
+
+    valid_end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end += len(line)
+            canonical = record.get("canonical") or canonical_form(record["puzzle"])
+            seen.add(canonical)
+            counts[record["difficulty"]] = counts.get(record["difficulty"], 0) + 1
+            max_seed = max(max_seed, record["seed"])
+    if valid_end != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_end)
+    return counts, seen, max_seed
+
+
+def run_batch(output, count, difficulties, workers=None, seed=0, engine=SOLVER_ENGINE, resume=False, graded=False,
+              force=False):
+    """ 難易度ごとに count 問になるまで並列生成し、output に追記する
+
+    resume も force も指定せずに既存のファイルを指定した場合は、上書きせずに FileExistsError にする。
+    """
+    workers = workers or os.cpu_count() or 1
+    if not resume and not force and os.path.exists(output):
+        raise FileExistsError(f"{output} は既に存在します (続きから生成するには --resume、上書きするには --force)")
+    if resume:
+        done, seen, max_seed = load_existing(output)
+        next_seed = max(seed, max_seed + 1)
+    else:
+        done, seen, next_seed = {}, set(), seed
+        open(output, "w").close()
+
+    need = {d: max(0, count - done.get(d, 0)) for d in difficulties}
+    in_flight = {d: 0 for d in difficulties}
+    pending = {}
+    written = duplicates = misses = 0
+    start = last_report = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output, "a", encoding="utf-8") as out:
+        while True:
+            # 必要数に対して足りない分だけタスクを投入する (投入数はワーカー数の数倍まで)
+            for d in difficulties:
+                while need[d] - in_flight[d] > 0 and len(pending) < workers * 4:
+                    future = pool.submit(generate_one, next_seed, d, engine, graded)
+                    pending[future] = d
+                    in_flight[d] += 1
+                    next_seed += 1
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                d = pending.pop(future)
+                in_flight[d] -= 1
+                record = future.result()
+                if record is None:
+                    misses += 1  # 目標の難易度にならなかったシード (別のシードで作り直す)
+                    continue
+                if record["canonical"] in seen:
+                    duplicates += 1
+                    continue
+                seen.add(record["canonical"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                need[d] -= 1
+                written += 1
+            out.flush()
+
+            now = time.perf_counter()
+            if now - last_report >= 1:
+                last_report = now
+                rate = written / (now - start)
+                remaining = sum(need.values())
+                print(f"生成: {written} 問  重複: {duplicates}  難易度不一致: {misses}  残り: {remaining}  "
+                      f"{rate:.1f} puzzles/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(f"完了: {written} 問 ({elapsed:.1f} 秒, {rate:.1f} puzzles/s, 重複 {duplicates} 件, "
+          f"難易度不一致 {misses} 件)", file=sys.stderr)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数独の問題を一括生成して JSON Lines に追記する")
+    parser.add_argument("--output", default="puzzles.jsonl", help="出力ファイル (JSON Lines)")
+    parser.add_argument("--count", type=int, default=100, help="難易度ごとの問題数")
+    parser.add_argument("--difficulty", nargs="+", choices=list(DIFFICULTY_LEVELS),
+                        default=list(DIFFICULTY_LEVELS), help="生成する難易度")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカー数 (既定: CPUコア数)")
+    parser.add_argument("--seed", type=int, default=0, help="最初のシード")
+    parser.add_argument("--engine", choices=list(SOLVER_ENGINES), default=SOLVER_ENGINE, help="ソルバーエンジン")
+    parser.add_argument("--resume", action="store_true", help="既存の出力から続きを生成する")
+    parser.add_argument("--force", action="store_true", help="既存の出力を上書きする")
+    parser.add_argument("--graded", action="store_true", help="手筋による難易度判定が一致する問題だけを作る")
+    args = parser.parse_args(argv)
+    try:
+        run_batch(args.output, args.count, args.difficulty, args.workers, args.seed, args.engine, args.resume,
+                  args.graded, args.force)
+    except FileExistsError as e:
+        print(f"エラー: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# 数独ソルバーのベンチマーク
+#
+# benchmark_corpus.json の問題 (easy / hard / 17clue) を解き、
+# 解答時間の p50/p95/p99・探索ノード数・puzzles/s を計測して JSON に書き出す。
+# 1問ごとに計測前に1回解いて (ウォームアップ) から repeat 回計測し、最小値をその問題の時間とする
+# (他のプロセスやGCによる遅れは足されるだけなので、最小値が最もばらつきが小さい)。
+# マシンの速さ (クロックや他の負荷) は実行ごとに大きく変わるので、各問題の直後に基準の計算
+# (整数演算のループ) の時間も測り、その比 (relative_total) を実行をまたいで比べる。
+# ベースラインとの比較は、エンジンとコーパス (SHA-256) が同じ場合だけ行い、
+# 1回だけの外れ値に引きずられる p95 ではなく、relative_total と平均探索ノード数で判定する。
+# 例: python benchmark.py --output result.json --baseline baseline.json
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+
+from batch import generate_one
+from dlx import DancingLinks
+from engine import BitmaskSolver
+from generator import DIFFICULTY_LEVELS, SOLVER_ENGINE
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_corpus.json")
+SOLVER_CLASSES = {"bitmask": BitmaskSolver, "dlx": DancingLinks}
+MIN_MEASURE_SECONDS = 0.02  # 1項目あたりの計測時間の下限
+CALIBRATION_LOOPS = 20_000  # 基準の計算のループ回数 (1〜2ms 程度)
+TIMING_METHOD = "min-relative"  # 計測方法が変わったら変える (違うベースラインとは比較しない)
+
+
+def parse_puzzle(text):
+    """ 81文字の文字列を盤面に変換 ('.' と '0' は空きマス) """
+    return [[int(ch) if ch not in ".0" else 0 for ch in text[row * 9:row * 9 + 9]] for row in range(9)]
+
+
+def percentile(values, p):
+    """ 最近傍順位法によるパーセンタイル """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(times, relative, nodes=None):
+    """ 計測値を集計する (時間はミリ秒, 探索ノード数を計測しない場合は nodes=None)
+
+    relative は各時間と、その直後に測った基準の計算の時間との比。
+    """
+    total = sum(times)
+    summary = {
+        "count": len(times),
+        "p50_ms": percentile(times, 50) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+        "max_ms": max(times) * 1000 if times else 0.0,
+        "total_ms": total * 1000,
+        "relative_total": sum(relative),
+        "puzzles_per_sec": len(times) / total if total > 0 else 0.0,
+    }
+    if nodes is not None:
+        summary["mean_nodes"] = sum(nodes) / len(nodes) if nodes else 0.0
+        summary["max_nodes"] = max(nodes) if nodes else 0
+    return summary
+
+
+def best_time(function, repeat):
+    """ 1回ウォームアップしてから計測し、最も短い時間 (秒) と最後の戻り値を返す
+
+    repeat 回以上、かつ計測時間の合計が MIN_MEASURE_SECONDS になるまで繰り返す
+    (1ms 未満で終わる問題は回数を増やさないと最小値が安定しない)。
+    """
+    result = function()
+    best = math.inf
+    runs = 0
+    measured = 0.0
+    while runs < max(1, repeat) or measured < MIN_MEASURE_SECONDS:
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        runs += 1
+        measured += elapsed
+    return best, result
+
+
+def _calibration_loop():
+    total = 0
+    for i in range(CALIBRATION_LOOPS):
+        total += (i * i) & 0xFFFF
+    return total
+
+
+def measure(function, repeat):
+    """ function の最短時間 (秒)、その直後に測った基準の計算の最短時間との比、最後の戻り値を返す """
+    elapsed, result = best_time(function, repeat)
+    reference, _ = best_time(_calibration_loop, repeat)
+    return elapsed, elapsed / reference, result
+
+
+def bench_solver(puzzles, engine, repeat=1):
+    """ 各問題を解いて解答時間と探索ノード数を計測する (一意性の確認まで含む) """
+    solver_class = SOLVER_CLASSES[engine]
+    times, relative, nodes = [], [], []
+    for text in puzzles:
+        board = parse_puzzle(text)
+
+        def run():
+            solver = solver_class(board)
+            return solver.run(2), solver.nodes
+
+        elapsed, ratio, (solutions, solver_nodes) = measure(run, repeat)
+        if solutions != 1:
+            raise ValueError(f"解が一意ではありません: {text}")
+        times.append(elapsed)
+        relative.append(ratio)
+        nodes.append(solver_nodes)
+    return summarize(times, relative, nodes)
+
+
+def bench_generator(difficulty, count, engine, repeat=1):
+    """ 問題生成 (完成盤面の作成 + 数字の削除) の時間を計測する (探索ノード数は計測しない)
+
+    同じシードからは同じ問題ができるので、シードごとに repeat 回の最小値を使う。
+    """
+    times, relative = [], []
+    for seed in range(count):
+        elapsed, ratio, _ = measure(lambda: generate_one(seed, difficulty, engine), repeat)
+        times.append(elapsed)
+        relative.append(ratio)
+    return summarize(times, relative)
+
+
+def run_benchmark(engine=SOLVER_ENGINE, repeat=1, generate=10, corpus_path=CORPUS_PATH):
+    """ コーパス全体と問題生成のベンチマークを実行し、結果を辞書で返す """
+    with open(corpus_path, "rb") as f:
+        data = f.read()
+    corpus = json.loads(data)
+
+    results = {"engine": engine, "corpus_sha256": hashlib.sha256(data).hexdigest(), "timing": TIMING_METHOD,
+               "solve": {}, "generate": {}}
+    for category, puzzles in corpus.items():
+        results["solve"][category] = bench_solver(puzzles, engine, repeat)
+    for difficulty in DIFFICULTY_LEVELS:
+        if generate > 0:
+            results["generate"][difficulty] = bench_generator(difficulty, generate, engine, repeat)
+    return results
+
+
+def incompatibilities(results, baseline):
+    """ ベースラインと比較できない理由 (エンジンやコーパスの違い) のリストを返す """
+    reasons = []
+    for key, label in (("engine", "エンジン"), ("corpus_sha256", "コーパス"), ("timing", "計測方法")):
+        if baseline.get(key) != results.get(key):
+            reasons.append(f"{label}が異なります: {baseline.get(key)} -> {results.get(key)}")
+    return reasons
+
+
+def compare(results, baseline, threshold=1.2):
+    """ ベースラインと比較し、relative_total または平均探索ノード数が threshold 倍を超えた項目を返す
+
+    時間は基準の計算との比で比べるので、実行ごとのマシンの速さの違いは含まれない。
+    探索ノード数は計測している項目 (solve) だけを比較する (決定的なのでばらつかない)。
+    """
+    regressions = []
+    for section in ("solve", "generate"):
+        for name, current in results.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not base:
+                continue
+            if base.get("relative_total", 0) > 0 and current["relative_total"] / base["relative_total"] > threshold:
+                regressions.append(f"{section}/{name} relative_total: {base['relative_total']:.2f} -> "
+                                   f"{current['relative_total']:.2f} "
+                                   f"({current['relative_total'] / base['relative_total']:.2f}x)")
+            if "mean_nodes" in current and base.get("mean_nodes", 0) > 0 \
+                    and current["mean_nodes"] / base["mean_nodes"] > threshold:
+                regressions.append(f"{section}/{name} mean_nodes: {base['mean_nodes']:.1f} -> "
+                                   f"{current['mean_nodes']:.1f} ({current['mean_nodes'] / base['mean_nodes']:.2f}x)")
+    return regressions
+
+
+def print_results(results):
+    print(f"エンジン: {results['engine']}")
+    for section in ("solve", "generate"):
+        for name, r in results[section].items():
+            nodes = f"{r['mean_nodes']:8.1f}" if "mean_nodes" in r else f"{'-':>8s}"
+            print(f"  {section:8s} {name:12s} n={r['count']:4d}  p50={r['p50_ms']:8.3f}ms  "
+                  f"p95={r['p95_ms']:8.3f}ms  p99={r['p99_ms']:8.3f}ms  rel={r['relative_total']:8.2f}  "
+                  f"nodes={nodes}  {r['puzzles_per_sec']:8.1f} puzzles/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数独ソルバーのベンチマーク")
+    parser.add_argument("--engine", choices=list(SOLVER_CLASSES), default=SOLVER_ENGINE, help="ソルバーエンジン")
+    parser.add_argument("--repeat", type=int, default=5, help="1問あたりの計測回数 (最小値を使う)")
+    parser.add_argument("--generate", type=int, default=10, help="難易度ごとの生成回数 (0 で省略)")
+    parser.add_argument("--output", help="結果を書き出す JSON ファイル")
+    parser.add_argument("--baseline", help="比較するベースラインの JSON ファイル")
+    parser.add_argument("--threshold", type=float, default=1.2, help="退行とみなす倍率")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.engine, args.repeat, args.generate)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        reasons = incompatibilities(results, baseline)
+        if reasons:
+            print("ベースラインと条件が異なるため比較できません:")
+            for line in reasons:
+                print(f"  {line}")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("性能の退行があります:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("ベースラインからの退行はありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# 数独ソルバーエンジン (Algorithm X / Dancing Links)
+#
+# 数独を厳密被覆問題として扱う。列は「セル」「行×数字」「列×数字」「ブロック×数字」の4種類。
+# ノードは Python オブジェクトではなく整数配列 (L/R/U/D/C) で表現する。
+
+
+class DancingLinks:
+    """ Dancing Links による数独ソルバー """
+
+    def __init__(self, board, box=3):
+        n = box * box
+        self.n = n
+        ncols = 4 * n * n
+        # 0 はルート、1..ncols は列ヘッダ
+        self.L = [i - 1 for i in range(ncols + 1)]
+        self.R = [i + 1 for i in range(ncols + 1)]
+        self.L[0], self.R[ncols] = ncols, 0
+        self.U = list(range(ncols + 1))
+        self.D = list(range(ncols + 1))
+        self.C = list(range(ncols + 1))
+        self.S = [0] * (ncols + 1)
+        self.row_of = [0] * (ncols + 1)  # ノード → 候補 (cell * n + 数字-1)
+        self.first = {}  # 候補 → その行の先頭ノード
+        self.nodes = 0
+        self.solutions = 0
+        self.solution = None
+        self.consistent = True
+        self.node_limit = None
+        self.aborted = False
+
+        nn = n * n
+        for r in range(n):
+            for c in range(n):
+                b = (r // box) * box + c // box
+                for d in range(n):
+                    cols = (1 + r * n + c,
+                            1 + nn + r * n + d,
+                            1 + 2 * nn + c * n + d,
+                            1 + 3 * nn + b * n + d)
+                    self._add_row(r * nn + c * n + d, cols)
+
+        # 初期値の行を選択済みにする
+        self.chosen = []
+        for r in range(n):
+            for c in range(n):
+                num = board[r][c]
+                if num:
+                    if not self._select(r * nn + c * n + num - 1):
+                        self.consistent = False
+                        return
+
+    def _add_row(self, cand, cols):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        start = len(L)
+        for k, col in enumerate(cols):
+            node = start + k
+            L.append(start + (k - 1) % len(cols))
+            R.append(start + (k + 1) % len(cols))
+            U.append(U[col])
+            D.append(col)
+            C.append(col)
+            D[U[col]] = node
+            U[col] = node
+            S[col] += 1
+            self.row_of.append(cand)
+        self.first[cand] = start
+
+    def _cover(self, col):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[col]] = R[col]
+        L[R[col]] = L[col]
+        i = D[col]
+        while i != col:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, col):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[col]
+        while i != col:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[col]] = col
+        L[R[col]] = col
+
+    def _select(self, cand):
+        """ 初期値の候補行を選び、その行が満たす列を被覆する """
+        node = self.first[cand]
+        j = node
+        while True:
+            col = self.C[j]
+            # 既に被覆済みの列 (同じ制約を2つの初期値が満たす) なら矛盾
+            if self.R[self.L[col]] != col:
+                return False
+            j = self.R[j]
+            if j == node:
+                break
+        j = node
+        while True:
+            self._cover(self.C[j])
+            j = self.R[j]
+            if j == node:
+                break
+        self.chosen.append(cand)
+        return True
+
+    def _search(self, limit):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            self.aborted = True
+            return
+        R, D, S, C = self.R, self.D, self.S, self.C
+        if R[0] == 0:
+            self.solutions += 1
+            if self.solution is None:
+                self.solution = self.chosen[:]
+            return
+
+        # 要素数が最小の列を選ぶ
+        col, size = 0, None
+        j = R[0]
+        while j != 0:
+            if size is None or S[j] < size:
+                col, size = j, S[j]
+                if size <= 1:
+                    break
+            j = R[j]
+        if size == 0:
+            return
+
+        self._cover(col)
+        r = D[col]
+        while r != col and not self.aborted and (limit is None or self.solutions < limit):
+            self.chosen.append(self.row_of[r])
+            j = R[r]
+            while j != r:
+                self._cover(C[j])
+                j = R[j]
+            self._search(limit)
+            j = self.L[r]
+            while j != r:
+                self._uncover(C[j])
+                j = self.L[j]
+            self.chosen.pop()
+            r = D[r]
+        self._uncover(col)
+
+    def run(self, limit=None, node_limit=None):
+        """ 解を探索し、見つかった解の数を返す (limit に達したら打ち切り)
+
+        node_limit を超えて探索した場合は None を返す。
+        """
+        self.node_limit = node_limit
+        if self.consistent:
+            self._search(limit)
+        return None if self.aborted else self.solutions
+
+    def solution_board(self):
+        """ 最初に見つかった解を2次元リストで返す """
+        if self.solution is None:
+            return None
+        n = self.n
+        board = [[0] * n for _ in range(n)]
+        for cand in self.solution:
+            cell, d = divmod(cand, n)
+            board[cell // n][cell % n] = d + 1
+        return board
+
+
+def dlx_solve(board, max_solutions=None, box=3, node_limit=None):
+    """ 解の数 (max_solutions で打ち切り、node_limit 超過時は None) と最初の解を返す """
+    solver = DancingLinks(board, box)
+    count = solver.run(max_solutions, node_limit)
+    return count, solver.solution_board()
@@ -0,0 +1,187 @@
+# 数独ソルバーエンジン (ビットマスク + 制約伝播)
+#
+# 行・列・ブロックごとに使用済み数字をビットマスクで持ち、
+# 候補数が最も少ないセルから探索する。探索前に naked single / hidden single を伝播させる。
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _tables(box):
+    """ ブロックサイズごとの参照テーブル (セル→行/列/ブロック番号, ユニット一覧) を作成 """
+    n = box * box
+    cell_row = [i // n for i in range(n * n)]
+    cell_col = [i % n for i in range(n * n)]
+    cell_box = [(r // box) * box + c // box for r, c in zip(cell_row, cell_col)]
+
+    units = []
+    for r in range(n):
+        units.append((0, r, tuple(r * n + c for c in range(n))))
+    for c in range(n):
+        units.append((1, c, tuple(r * n + c for r in range(n))))
+    for b in range(n):
+        br, bc = (b // box) * box, (b % box) * box
+        units.append((2, b, tuple((br + i) * n + bc + j for i in range(box) for j in range(box))))
+    return n, cell_row, cell_col, cell_box, tuple(units)
+
+
+class BitmaskSolver:
+    """ ビットマスクで候補を管理する数独ソルバー """
+
+    def __init__(self, board, box=3):
+        n, self.cell_row, self.cell_col, self.cell_box, self.units = _tables(box)
+        self.n = n
+        self.full = (1 << n) - 1
+        self.grid = [0] * (n * n)
+        self.cand = [0] * (n * n)  # 伝播中に使い回す候補キャッシュ
+        self.rows = [0] * n
+        self.cols = [0] * n
+        self.boxes = [0] * n
+        self.masks = (self.rows, self.cols, self.boxes)
+        self.trail = []
+        self.nodes = 0
+        self.solutions = 0
+        self.solution = None
+        self.consistent = True
+        self.node_limit = None
+        self.aborted = False
+
+        for r in range(n):
+            for c in range(n):
+                num = board[r][c]
+                if num and not self._place(r * n + c, 1 << (num - 1)):
+                    self.consistent = False
+
+    def _place(self, i, bit):
+        """ セル i に bit の数字を置く (矛盾する場合は False) """
+        r, c, b = self.cell_row[i], self.cell_col[i], self.cell_box[i]
+        if (self.rows[r] | self.cols[c] | self.boxes[b]) & bit:
+            return False
+        self.grid[i] = bit
+        self.rows[r] |= bit
+        self.cols[c] |= bit
+        self.boxes[b] |= bit
+        self.trail.append(i)
+        return True
+
+    def _undo(self, mark):
+        """ trail を mark の位置まで巻き戻す """
+        trail, grid = self.trail, self.grid
+        while len(trail) > mark:
+            i = trail.pop()
+            bit = grid[i]
+            grid[i] = 0
+            self.rows[self.cell_row[i]] &= ~bit
+            self.cols[self.cell_col[i]] &= ~bit
+            self.boxes[self.cell_box[i]] &= ~bit
+
+    def _propagate(self):
+        """ naked single / hidden single を置けなくなるまで適用 (矛盾したら False) """
+        grid, cand, full = self.grid, self.cand, self.full
+        rows, cols, boxes = self.rows, self.cols, self.boxes
+        cell_row, cell_col, cell_box = self.cell_row, self.cell_col, self.cell_box
+        changed = True
+        while changed:
+            changed = False
+
+            # naked single: 候補が1つしかないセル
+            for i in range(len(grid)):
+                if grid[i]:
+                    continue
+                c = full & ~(rows[cell_row[i]] | cols[cell_col[i]] | boxes[cell_box[i]])
+                if not c:
+                    return False
+                if not c & (c - 1):
+                    if not self._place(i, c):
+                        return False
+                    changed = True
+                else:
+                    cand[i] = c
+            if changed:
+                continue
+
+            # hidden single: ユニット内で1か所にしか入らない数字
+            for kind, idx, cells in self.units:
+                once = twice = 0
+                for i in cells:
+                    if not grid[i]:
+                        twice |= once & cand[i]
+                        once |= cand[i]
+                need = full & ~self.masks[kind][idx]
+                if need & ~once:
+                    return False
+                hidden = need & ~twice
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for i in cells:
+                        if not grid[i] and cand[i] & bit:
+                            if not self._place(i, bit):
+                                return False
+                            changed = True
+                            break
+                    else:
+                        return False
+        return True
+
+    def _search(self, limit):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            self.aborted = True
+            return
+        mark = len(self.trail)
+        if not self._propagate():
+            self._undo(mark)
+            return
+
+        # 候補数が最も少ないセルを選ぶ
+        grid, cand = self.grid, self.cand
+        best, best_count = -1, self.n + 1
+        for i in range(len(grid)):
+            if not grid[i]:
+                count = cand[i].bit_count()
+                if count < best_count:
+                    best, best_count = i, count
+                    if count == 2:
+                        break
+
+        if best < 0:
+            self.solutions += 1
+            if self.solution is None:
+                self.solution = grid[:]
+            self._undo(mark)
+            return
+
+        c = cand[best]
+        while c and not self.aborted and (limit is None or self.solutions < limit):
+            bit = c & -c
+            c ^= bit
+            inner = len(self.trail)
+            self._place(best, bit)
+            self._search(limit)
+            self._undo(inner)
+        self._undo(mark)
+
+    def run(self, limit=None, node_limit=None):
+        """ 解を探索し、見つかった解の数を返す (limit に達したら打ち切り)
+
+        node_limit を超えて探索した場合は None を返す。
+        """
+        self.node_limit = node_limit
+        if self.consistent:
+            self._search(limit)
+        return None if self.aborted else self.solutions
+
+    def solution_board(self):
+        """ 最初に見つかった解を2次元リストで返す """
+        if self.solution is None:
+            return None
+        n = self.n
+        return [[bit.bit_length() for bit in self.solution[r * n:(r + 1) * n]] for r in range(n)]
+
+
+def bitmask_solve(board, max_solutions=None, box=3, node_limit=None):
+    """ 解の数 (max_solutions で打ち切り、node_limit 超過時は None) と最初の解を返す """
+    solver = BitmaskSolver(board, box)
+    count = solver.run(max_solutions, node_limit)
+    return count, solver.solution_board()
@@ -0,0 +1,172 @@
+# 数独の問題生成・求解 (pygame に依存しないのでバッチ生成からも使える)
+
+import math
+import random
+
+from engine import bitmask_solve
+from dlx import dlx_solve
+from logical import DIFFICULTY_RANK, grade
+
+# ソルバーエンジン ("bitmask" または "dlx")
+SOLVER_ENGINES = {"bitmask": bitmask_solve, "dlx": dlx_solve}
+SOLVER_ENGINE = "bitmask"
+DIFFICULTY_LEVELS = {"beginner": 30, "intermediate": 40, "advanced": 50}
+UNIQUENESS_NODE_LIMIT = 16  # 大きな盤面で一意性の確認に使う探索ノード数の上限
+GENERATE_NODES_PER_CELL = 2  # 完成盤面を作るときの探索ノード数の上限 (マス数に対する倍率)
+
+def board_box(board):
+    """ 盤面の大きさからブロックの一辺 (9×9 なら 3) を求める """
+    return math.isqrt(len(board))
+
+def is_valid(board, row, col, num):
+    """ 指定した (row, col) に num を入れてよいかチェック """
+    n = len(board)
+    box = board_box(board)
+    for i in range(n):
+        if board[row][i] == num or board[i][col] == num:
+            return False
+    
+    start_row, start_col = box * (row // box), box * (col // box)
+    for i in range(box):
+        for j in range(box):
+            if board[start_row + i][start_col + j] == num:
+                return False
+    return True
+
+def solve(board, count_solutions=False, max_solutions=None, engine=SOLVER_ENGINE, node_limit=None):
+    """ 指定したエンジンで数独を解く (解の数をカウントするオプション付き)
+
+    count_solutions=False の場合は最初の解を board に書き込み、解けたかどうかを返す。
+    max_solutions を指定すると、その数の解が見つかった時点で探索を打ち切る。
+    node_limit を超えて探索した場合、解の数は None になる (解けなかった扱い)。
+    盤面の大きさ (4×4 〜 25×25) は board から判断する。
+    """
+    limit = max_solutions if count_solutions else 1
+    solutions, solution = SOLVER_ENGINES[engine](board, limit, board_box(board), node_limit)
+    if count_solutions:
+        return solutions
+    if solution is None:
+        return False
+    for row in range(len(board)):
+        board[row][:] = solution[row]
+    return True
+
+def generate_sudoku(engine=SOLVER_ENGINE, rng=random, box=3):
+    """ 完成済みの数独をランダムに生成
+
+    埋め方によっては探索が極端に長くなる (25×25 で数十秒) ことがあるので、
+    探索ノード数が マス数 × GENERATE_NODES_PER_CELL を超えたら打ち切り、別の埋め方でやり直す。
+    """
+    n = box * box
+    node_limit = n * n * GENERATE_NODES_PER_CELL
+    while True:
+        # 対角線上のブロックは互いに干渉しないので、ランダムな順列で埋めてから解く
+        board = [[0] * n for _ in range(n)]
+        for k in range(box):
+            nums = rng.sample(range(1, n + 1), n)
+            for i in range(box):
+                for j in range(box):
+                    board[k * box + i][k * box + j] = nums[i * box + j]
+        if solve(board, engine=engine, node_limit=node_limit):
+            return board
+
+def is_forced(puzzle, row, col, num):
+    """ 空きマス (row, col) に入る数字が num だけと、他の数字から直ちに決まるか
+
+    naked single (そのマスに num 以外が入らない) か hidden single
+    (行・列・ブロックのいずれかで num が入るのがそのマスだけ) なら True。
+    """
+    n = len(puzzle)
+    box = board_box(puzzle)
+    if not any(is_valid(puzzle, row, col, d) for d in range(1, n + 1) if d != num):
+        return True
+    start_row, start_col = box * (row // box), box * (col // box)
+    units = (
+        [(row, c) for c in range(n)],
+        [(r, col) for r in range(n)],
+        [(start_row + i, start_col + j) for i in range(box) for j in range(box)],
+    )
+    for unit in units:
+        if not any(puzzle[r][c] == 0 and (r, c) != (row, col) and is_valid(puzzle, r, c, num) for r, c in unit):
+            return True
+    return False
+
+def remove_numbers(board, difficulty, engine=SOLVER_ENGINE, rng=random):
+    """ 盤面から数字を消して問題を作成する (解が一意か確認)
+
+    消す数は 9×9 を基準に盤面の大きさに合わせて増減する。
+    全マスを試しても足りない場合は、そこまでで打ち切る。
+    16×16 以上では一意性の確認に探索ノード数の上限を設け、
+    すぐに一意だと示せないマスは消さずに残す。
+    """
+    n = len(board)
+    node_limit = None if n <= 9 else UNIQUENESS_NODE_LIMIT
+    puzzle = [row[:] for row in board]
+    count = DIFFICULTY_LEVELS.get(difficulty, 40) * n * n // 81
+    cells = [(row, col) for row in range(n) for col in range(n)]
+    rng.shuffle(cells)
+    for row, col in cells:
+        if count == 0:
+            break
+        temp = puzzle[row][col]
+        puzzle[row][col] = 0
+        # 消したマスが他の数字から一意に決まるなら、解の一意性は保たれるので探索しない
+        if is_forced(puzzle, row, col, temp):
+            count -= 1
+            continue
+        # 2つ目の解が見つかった時点で打ち切る
+        solutions = solve([row[:] for row in puzzle], count_solutions=True, max_solutions=2,
+                          engine=engine, node_limit=node_limit)
+        if solutions != 1:
+            puzzle[row][col] = temp  # 複数解があった場合、戻す
+        else:
+            count -= 1
+    return puzzle
+
+def _rank(puzzle):
+    """ 手筋による難易度の順位 (用意した手筋 (X-Wing まで) で解けない問題は None) """
+    graded, _ = grade(puzzle, board_box(puzzle))
+    return DIFFICULTY_RANK.get(graded) if graded else None
+
+def generate_graded(difficulty, engine=SOLVER_ENGINE, rng=random, attempts=20, box=3):
+    """ 手筋による難易度判定が difficulty と一致する問題を作り、(完成盤面, 問題) を返す
+
+    remove_numbers() で消しすぎて手筋だけでは解けなくなった場合は、解けるようになるまで
+    完成盤面から数字を戻す。目標より易しければ、一意性と難易度を保てる範囲でさらに数字を消していく。
+    判定は探索を使わないので安価。
+    attempts 回で一致しなければ None を返す (別のシードでやり直す)。
+    """
+    n = box * box
+    node_limit = None if n <= 9 else UNIQUENESS_NODE_LIMIT
+    target = DIFFICULTY_RANK.get(difficulty, DIFFICULTY_RANK["intermediate"])
+    for _ in range(attempts):
+        solution = generate_sudoku(engine=engine, rng=rng, box=box)
+        puzzle = remove_numbers(solution, difficulty, engine=engine, rng=rng)
+        rank = _rank(puzzle)
+        if rank is None:
+            # X-Wing より難しい問題はどの難易度にも入れず、解けるようになるまでヒントを戻す
+            empty = [(row, col) for row in range(n) for col in range(n) if not puzzle[row][col]]
+            rng.shuffle(empty)
+            while rank is None and empty:
+                row, col = empty.pop()
+                puzzle[row][col] = solution[row][col]
+                rank = _rank(puzzle)
+        if rank < target:
+            cells = [(row, col) for row in range(n) for col in range(n) if puzzle[row][col]]
+            rng.shuffle(cells)
+            for row, col in cells:
+                temp = puzzle[row][col]
+                puzzle[row][col] = 0
+                unique = is_forced(puzzle, row, col, temp) or \
+                    solve([r[:] for r in puzzle], count_solutions=True, max_solutions=2, engine=engine,
+                          node_limit=node_limit) == 1
+                new_rank = _rank(puzzle) if unique else None
+                if new_rank is None or new_rank > target:
+                    puzzle[row][col] = temp  # 一意でない・手筋で解けない・難しくなりすぎる場合は戻す
+                    continue
+                rank = new_rank
+                if rank == target:
+                    break
+        if rank == target:
+            return solution, puzzle
+    return None
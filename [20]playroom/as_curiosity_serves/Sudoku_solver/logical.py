@@ -0,0 +1,236 @@
+# 人間の解き方による数独ソルバー (ヒント・難易度判定用)
+#
+# 手筋を軽い順 (シングル → ペア → ポインティング → X-Wing) に試し、最初に使えたものだけを適用する。
+# 探索を行わないので、ヒントの計算や難易度の判定はバックトラッキングよりずっと軽い。
+
+from collections import namedtuple
+from functools import lru_cache
+
+from engine import _tables
+
+# 手筋と、その手筋が必要な問題の難易度
+TECHNIQUES = [
+    ("naked_single", "beginner"),
+    ("hidden_single", "beginner"),
+    ("naked_pair", "intermediate"),
+    ("hidden_pair", "intermediate"),
+    ("pointing", "intermediate"),
+    ("x_wing", "advanced"),
+]
+TECHNIQUE_NAMES = [name for name, _ in TECHNIQUES]
+DIFFICULTY_RANK = {"beginner": 0, "intermediate": 1, "advanced": 2}
+
+# placements: [(セル番号, 数字)], eliminations: [(セル番号, 消す候補のビット)]
+Step = namedtuple("Step", ["technique", "placements", "eliminations"])
+Hint = namedtuple("Hint", ["row", "col", "value", "technique"])
+
+
+@lru_cache(maxsize=None)
+def _peers(box):
+    """ セルごとの「同じ行・列・ブロックにある他のセル」 """
+    n, _, _, _, units = _tables(box)
+    peers = [set() for _ in range(n * n)]
+    for _, _, cells in units:
+        for i in cells:
+            peers[i].update(cells)
+    for i, cells in enumerate(peers):
+        cells.discard(i)
+    return tuple(tuple(sorted(cells)) for cells in peers)
+
+
+class LogicalSolver:
+    """ 候補をビットマスクで持ち、手筋を1つずつ適用するソルバー """
+
+    def __init__(self, board, box=3):
+        n, self.cell_row, self.cell_col, self.cell_box, units = _tables(box)
+        self.n = n
+        self.box = box
+        self.units = [cells for _, _, cells in units]
+        self.rows = self.units[:n]
+        self.cols = self.units[n:2 * n]
+        self.boxes = self.units[2 * n:]
+        self.peers = _peers(box)
+
+        full = (1 << n) - 1
+        self.grid = [num for row in board for num in row]
+        self.cand = [0 if num else full for num in self.grid]
+        for i, num in enumerate(self.grid):
+            if num:
+                for p in self.peers[i]:
+                    self.cand[p] &= ~(1 << (num - 1))
+
+    def place(self, i, num):
+        bit = 1 << (num - 1)
+        self.grid[i] = num
+        self.cand[i] = 0
+        for p in self.peers[i]:
+            self.cand[p] &= ~bit
+
+    def apply(self, step):
+        for i, num in step.placements:
+            self.place(i, num)
+        for i, bits in step.eliminations:
+            self.cand[i] &= ~bits
+
+    def is_solved(self):
+        return all(self.grid)
+
+    def is_broken(self):
+        """ 候補が無くなった空きマスがあるか (盤面に誤りがある) """
+        return any(not num and not c for num, c in zip(self.grid, self.cand))
+
+    # --- 手筋 ---
+
+    def naked_single(self):
+        for i, c in enumerate(self.cand):
+            if c and not c & (c - 1):
+                return Step("naked_single", [(i, c.bit_length())], [])
+        return None
+
+    def hidden_single(self):
+        cand = self.cand
+        for cells in self.units:
+            once = twice = 0
+            for i in cells:
+                twice |= once & cand[i]
+                once |= cand[i]
+            hidden = once & ~twice
+            if hidden:
+                bit = hidden & -hidden
+                for i in cells:
+                    if cand[i] & bit:
+                        return Step("hidden_single", [(i, bit.bit_length())], [])
+        return None
+
+    def naked_pair(self):
+        cand = self.cand
+        for cells in self.units:
+            seen = {}
+            for i in cells:
+                c = cand[i]
+                if c.bit_count() == 2:
+                    if c in seen:
+                        pair = (seen[c], i)
+                        eliminations = [(j, cand[j] & c) for j in cells if j not in pair and cand[j] & c]
+                        if eliminations:
+                            return Step("naked_pair", [], eliminations)
+                    else:
+                        seen[c] = i
+        return None
+
+    def hidden_pair(self):
+        cand = self.cand
+        for cells in self.units:
+            # 数字ごとに「入りうるマス」の組を集め、ちょうど2マスの数字を探す
+            places = {}
+            for d in range(self.n):
+                bit = 1 << d
+                where = tuple(i for i in cells if cand[i] & bit)
+                if len(where) == 2:
+                    places.setdefault(where, []).append(bit)
+            for where, bits in places.items():
+                if len(bits) == 2:
+                    pair = bits[0] | bits[1]
+                    eliminations = [(i, cand[i] & ~pair) for i in where if cand[i] & ~pair]
+                    if eliminations:
+                        return Step("hidden_pair", [], eliminations)
+        return None
+
+    def pointing(self):
+        """ ブロック内の候補が1行/1列に揃う場合 (pointing) と、その逆 (box/line reduction) """
+        cand = self.cand
+        for d in range(self.n):
+            bit = 1 << d
+            for b, cells in enumerate(self.boxes):
+                where = [i for i in cells if cand[i] & bit]
+                if len(where) < 2:
+                    continue
+                for line_of, lines in ((self.cell_row, self.rows), (self.cell_col, self.cols)):
+                    line = line_of[where[0]]
+                    if all(line_of[i] == line for i in where):
+                        eliminations = [(i, bit) for i in lines[line]
+                                        if self.cell_box[i] != b and cand[i] & bit]
+                        if eliminations:
+                            return Step("pointing", [], eliminations)
+            for lines in (self.rows, self.cols):
+                for cells in lines:
+                    where = [i for i in cells if cand[i] & bit]
+                    if len(where) < 2:
+                        continue
+                    b = self.cell_box[where[0]]
+                    if all(self.cell_box[i] == b for i in where):
+                        eliminations = [(i, bit) for i in self.boxes[b] if i not in where and cand[i] & bit]
+                        if eliminations:
+                            return Step("pointing", [], eliminations)
+        return None
+
+    def x_wing(self):
+        cand = self.cand
+        for d in range(self.n):
+            bit = 1 << d
+            for base, cover, cover_of in ((self.rows, self.cols, self.cell_col), (self.cols, self.rows, self.cell_row)):
+                seen = {}
+                for cells in base:
+                    where = [i for i in cells if cand[i] & bit]
+                    if len(where) != 2:
+                        continue
+                    key = (cover_of[where[0]], cover_of[where[1]])
+                    if key in seen:
+                        corners = set(where) | set(seen[key])
+                        eliminations = [(i, bit) for line in key for i in cover[line]
+                                        if i not in corners and cand[i] & bit]
+                        if eliminations:
+                            return Step("x_wing", [], eliminations)
+                    else:
+                        seen[key] = where
+        return None
+
+    def next_step(self):
+        """ 軽い手筋から順に試し、最初に見つかった1手を返す (行き詰まったら None) """
+        for technique, _ in TECHNIQUES:
+            step = getattr(self, technique)()
+            if step:
+                return step
+        return None
+
+
+def next_hint(board, box=3):
+    """ 次に置ける数字を1つ返す (候補の削除だけの手筋は内部で適用して進める)
+
+    論理だけでは次の数字が決まらない場合や、盤面が矛盾している場合は None。
+    """
+    solver = LogicalSolver(board, box)
+    if solver.is_broken():
+        return None
+    hardest = 0
+    while not solver.is_solved():
+        step = solver.next_step()
+        if step is None:
+            return None
+        hardest = max(hardest, TECHNIQUE_NAMES.index(step.technique))
+        if step.placements:
+            i, num = step.placements[0]
+            return Hint(i // solver.n, i % solver.n, num, TECHNIQUES[hardest][0])
+        solver.apply(step)
+    return None
+
+
+def grade(board, box=3):
+    """ 論理だけで解き、(難易度, 必要だった最も難しい手筋) を返す
+
+    用意した手筋だけでは解けない場合は (None, None)。
+    """
+    solver = LogicalSolver(board, box)
+    if solver.is_broken():
+        return None, None
+    hardest = 0
+    while not solver.is_solved():
+        step = solver.next_step()
+        if step is None:
+            return None, None
+        hardest = max(hardest, TECHNIQUE_NAMES.index(step.technique))
+        solver.apply(step)
+        if solver.is_broken():
+            return None, None
+    technique, difficulty = TECHNIQUES[hardest]
+    return difficulty, technique
@@ -2,15 +2,19 @@
 
 import pygame
 import sys
-import random
 import json
+import math
+
+from generator import generate_sudoku, remove_numbers
+from tracker import ConflictTracker
+from logical import next_hint
 
 # Pygame 初期化
 pygame.init()
 
 # 画面設定
 WIDTH, HEIGHT = 540, 700  # ボタン用に高さを増やす
-GRID_SIZE = 60
+BOARD_PIXELS = 540
 SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("数独")
 
@@ -27,120 +31,97 @@ FONT = pygame.font.Font(None, 40)
 
 # ボタンの設定
 NEW_GAME_BUTTON = pygame.Rect(20, 600, 200, 40)
-NUMBER_BUTTONS = [pygame.Rect(240 + i*30, 600, 25, 40) for i in range(9)]
+SIZE_BUTTON = pygame.Rect(20, 650, 200, 40)
 
-def is_valid(board, row, col, num):
-    """ 指定した (row, col) に num を入れてよいかチェック """
-    for i in range(9):
-        if board[row][i] == num or board[i][col] == num:
-            return False
-    
-    start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-    for i in range(3):
-        for j in range(3):
-            if board[start_row + i][start_col + j] == num:
-                return False
-    return True
-
-def solve(board, count_solutions=False):
-    """ バックトラッキングで数独を解く (解の数をカウントするオプション付き) """
-    solutions = 0
-    def backtrack():
-        nonlocal solutions
-        for row in range(9):
-            for col in range(9):
-                if board[row][col] == 0:
-                    for num in range(1, 10):
-                        if is_valid(board, row, col, num):
-                            board[row][col] = num
-                            backtrack()
-                            board[row][col] = 0
-                    return
-        solutions += 1
-    
-    backtrack()
-    return solutions if count_solutions else solutions == 1
-
-def generate_sudoku():
-    """ 完成済みの数独をランダムに生成 """
-    board = [[0] * 9 for _ in range(9)]
-    for i in range(9):
-        num = random.randint(1, 9)
-        while not is_valid(board, i, i, num):
-            num = random.randint(1, 9)
-        board[i][i] = num
-    solve(board)
-    return board
-
-def remove_numbers(board, difficulty):
-    """ 盤面から数字を消して問題を作成する (解が一意か確認) """
-    puzzle = [row[:] for row in board]
-    difficulty_levels = {"beginner": 30, "intermediate": 40, "advanced": 50}
-    count = difficulty_levels.get(difficulty, 40)
-    while count > 0:
-        row, col = random.randint(0, 8), random.randint(0, 8)
-        while puzzle[row][col] == 0:
-            row, col = random.randint(0, 8), random.randint(0, 8)
-        temp = puzzle[row][col]
-        puzzle[row][col] = 0
-        if solve([row[:] for row in puzzle], count_solutions=True) > 1:
-            puzzle[row][col] = temp  # 複数解があった場合、戻す
-        else:
-            count -= 1
-    return puzzle
+# 描画の上限フレームレート (イベントがない間は描画しない)
+FPS = 60
+
+# 10 以上の数字は英字で表示・入力する
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+NEW_GAME_TEXT = FONT.render("新規ゲーム", True, BLACK)
+
+def set_board_size(box):
+    """ 盤面の大きさ (ブロックの一辺 2〜5) を切り替え、マスの大きさ・ボタン・文字を作り直す """
+    global BOX, N, GRID_SIZE, GLYPHS, NUMBER_BUTTONS, BUTTON_GLYPHS, SIZE_TEXT
+    BOX = box
+    N = box * box
+    GRID_SIZE = BOARD_PIXELS // N
+
+    # 文字は色ごとに1度だけレンダリングして使い回す
+    cell_font = pygame.font.Font(None, GRID_SIZE * 2 // 3)
+    GLYPHS = {color: [None] + [cell_font.render(SYMBOLS[num - 1], True, color) for num in range(1, N + 1)]
+              for color in (BLACK, BLUE, RED)}
+
+    # 数字ボタンは1行に9個まで並べる
+    rows = (N + 8) // 9
+    top = 600 - (rows - 1) * 45 // 2
+    NUMBER_BUTTONS = [pygame.Rect(240 + (i % 9) * 30, top + (i // 9) * 45, 25, 40) for i in range(N)]
+    BUTTON_GLYPHS = [FONT.render(SYMBOLS[i], True, WHITE) for i in range(N)]
+    SIZE_TEXT = FONT.render(f"{N}x{N}", True, BLACK)
+
+set_board_size(3)
 
 def draw_buttons():
     """ ボタンを描画 """
     # 新規ゲーム開始ボタン
     pygame.draw.rect(SCREEN, GREEN, NEW_GAME_BUTTON)
-    text = FONT.render("新規ゲーム", True, BLACK)
-    SCREEN.blit(text, (30, 610))
+    SCREEN.blit(NEW_GAME_TEXT, (30, 610))
+    
+    # 盤面サイズ切り替えボタン
+    pygame.draw.rect(SCREEN, GRAY, SIZE_BUTTON)
+    SCREEN.blit(SIZE_TEXT, (30, 660))
     
     # 数字ボタン
-    for i in range(9):
+    for i in range(N):
         pygame.draw.rect(SCREEN, BLUE, NUMBER_BUTTONS[i])
-        text = FONT.render(str(i+1), True, WHITE)
-        SCREEN.blit(text, (245 + i*30, 610))
+        SCREEN.blit(BUTTON_GLYPHS[i], BUTTON_GLYPHS[i].get_rect(center=NUMBER_BUTTONS[i].center))
 
 def draw_grid():
     """ 数独の盤面を描画 """
     SCREEN.fill(WHITE)
-    for i in range(10):
-        line_width = 3 if i % 3 == 0 else 1
-        pygame.draw.line(SCREEN, BLACK, (i * GRID_SIZE, 0), (i * GRID_SIZE, 540), line_width)
-        pygame.draw.line(SCREEN, BLACK, (0, i * GRID_SIZE), (540, i * GRID_SIZE), line_width)
+    size = N * GRID_SIZE
+    for i in range(N + 1):
+        line_width = 3 if i % BOX == 0 else 1
+        pygame.draw.line(SCREEN, BLACK, (i * GRID_SIZE, 0), (i * GRID_SIZE, size), line_width)
+        pygame.draw.line(SCREEN, BLACK, (0, i * GRID_SIZE), (size, i * GRID_SIZE), line_width)
     draw_buttons()
 
+def draw_cell(board, original_board, row, col, selected_cell, invalid_cells):
+    """ 1マスだけ描き直し、更新が必要な矩形を返す """
+    rect = pygame.Rect(col * GRID_SIZE, row * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+    # 罫線 (太線は幅3) を消さないように内側だけ塗る
+    background = GRAY if (row, col) == selected_cell else WHITE
+    pygame.draw.rect(SCREEN, background, rect.inflate(-4, -4))
+
+    num = board[row][col]
+    if num != 0:
+        # 無効な数字を赤、元々あった数字を青で表示
+        if (row, col) in invalid_cells:
+            color = RED
+        elif original_board[row][col] != 0:
+            color = BLUE
+        else:
+            color = BLACK
+        glyph = GLYPHS[color][num]
+        SCREEN.blit(glyph, glyph.get_rect(center=rect.center))
+    return rect
+
 def draw_numbers(board, original_board, selected_cell, invalid_cells):
     """ 数独の数字を描画 """
-    for row in range(9):
-        for col in range(9):
-            # 選択されたセルの背景を灰色で描画
-            if (row, col) == selected_cell:
-                pygame.draw.rect(SCREEN, GRAY, (col * GRID_SIZE, row * GRID_SIZE, GRID_SIZE, GRID_SIZE))
-            
-            # 無効な数字を赤で表示
-            if (row, col) in invalid_cells:
-                color = RED
-            # 元々あった数字を青で表示
-            elif original_board[row][col] != 0:
-                color = BLUE
-            else:
-                color = BLACK
-
-            num = board[row][col]
-            if num != 0:
-                text = FONT.render(str(num), True, color)
-                SCREEN.blit(text, (col * GRID_SIZE + 20, row * GRID_SIZE + 15))
+    for row in range(N):
+        for col in range(N):
+            draw_cell(board, original_board, row, col, selected_cell, invalid_cells)
 
 def check_board_validity(board):
     """ 盤面全体の妥当性をチェック """
     invalid_cells = set()
+    n = len(board)
+    box = math.isqrt(n)
     
     # 各行をチェック
-    for row in range(9):
+    for row in range(n):
         nums = {}
-        for col in range(9):
+        for col in range(n):
             if board[row][col] != 0:
                 if board[row][col] in nums:
                     invalid_cells.add((row, col))
@@ -148,23 +129,23 @@ def check_board_validity(board):
                 nums[board[row][col]] = col
 
     # 各列をチェック
-    for col in range(9):
+    for col in range(n):
         nums = {}
-        for row in range(9):
+        for row in range(n):
             if board[row][col] != 0:
                 if board[row][col] in nums:
                     invalid_cells.add((row, col))
                     invalid_cells.add((nums[board[row][col]], col))
                 nums[board[row][col]] = row
 
-    # 各3x3ブロックをチェック
-    for block_row in range(3):
-        for block_col in range(3):
+    # 各ブロックをチェック
+    for block_row in range(box):
+        for block_col in range(box):
             nums = {}
-            for i in range(3):
-                for j in range(3):
-                    row = block_row * 3 + i
-                    col = block_col * 3 + j
+            for i in range(box):
+                for j in range(box):
+                    row = block_row * box + i
+                    col = block_col * box + j
                     if board[row][col] != 0:
                         if board[row][col] in nums:
                             invalid_cells.add((row, col))
@@ -184,37 +165,56 @@ def save_problems(valid_puzzles, invalid_puzzles):
 def print_board(board):
     """ 盤面を表示する """
     for row in board:
-        print(" ".join(str(num) if num != 0 else '.' for num in row))
+        print(" ".join(SYMBOLS[num - 1] if num != 0 else '.' for num in row))
 
 def main():
     # 初期盤面の生成
-    board = [[0] * 9 for _ in range(9)]  # 空の盤面で開始
+    board = [[0] * N for _ in range(N)]  # 空の盤面で開始
     original_board = [row[:] for row in board]
     
     selected_cell = None
-    invalid_cells = set()
+    tracker = ConflictTracker.from_board(board, BOX)  # 矛盾セルは差分更新で管理
+    clock = pygame.time.Clock()
     running = True
+    full_redraw = True
     
     while running:
-        SCREEN.fill(WHITE)
-        draw_grid()
-        draw_numbers(board, original_board, selected_cell, invalid_cells)
-        pygame.display.flip()
+        # 画面全体を描き直すのは初回・新規ゲーム・ウィンドウ再表示のときだけ
+        if full_redraw:
+            draw_grid()
+            draw_numbers(board, original_board, selected_cell, tracker.invalid_cells)
+            pygame.display.flip()
+            full_redraw = False
         
-        for event in pygame.event.get():
+        # イベントが来るまでブロックし、溜まっているイベントはまとめて処理する
+        events = [pygame.event.wait()] + pygame.event.get()
+        dirty_cells = set()
+        
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             
+            elif event.type == pygame.VIDEOEXPOSE:
+                full_redraw = True
+            
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = event.pos
                 
+                # 盤面サイズの切り替え (9×9 → 16×16 → 25×25 → 4×4 → ...) は新規ゲームとして扱う
+                new_game = NEW_GAME_BUTTON.collidepoint(x, y)
+                if SIZE_BUTTON.collidepoint(x, y):
+                    set_board_size((BOX - 1) % 4 + 2)
+                    new_game = True
+                
                 # 新規ゲームボタンのクリック処理
-                if NEW_GAME_BUTTON.collidepoint(x, y):
-                    complete_board = generate_sudoku()
+                if new_game:
+                    complete_board = generate_sudoku(box=BOX)
                     board = remove_numbers(complete_board, "intermediate")
                     original_board = [row[:] for row in board]
                     selected_cell = None
-                    invalid_cells = set()
+                    tracker = ConflictTracker.from_board(board, BOX)
+                    full_redraw = True
+                    continue
                 
                 # 数字ボタンのクリック処理
                 for i, button in enumerate(NUMBER_BUTTONS):
@@ -222,31 +222,63 @@ def main():
                         row, col = selected_cell
                         if original_board[row][col] == 0:
                             board[row][col] = i + 1
-                            invalid_cells = check_board_validity(board)
+                            dirty_cells |= tracker.set(row, col, i + 1)
+                            dirty_cells.add(selected_cell)
                 
                 # 盤面のセル選択
                 col = x // GRID_SIZE
                 row = y // GRID_SIZE
-                if 0 <= row < 9 and 0 <= col < 9:
+                if 0 <= row < N and 0 <= col < N:
                     if original_board[row][col] == 0:  # 元々の数字は変更不可
+                        if selected_cell:
+                            dirty_cells.add(selected_cell)
                         selected_cell = (row, col)
+                        dirty_cells.add(selected_cell)
+            
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                # スペースキーでヒント (手筋で次に決まるマスを1つ埋める)
+                hint = None if tracker.invalid_cells else next_hint(board, BOX)
+                if hint is None:
+                    print("ヒントが見つかりません")
+                    continue
+                row, col = hint.row, hint.col
+                board[row][col] = hint.value
+                dirty_cells |= tracker.set(row, col, hint.value)
+                if selected_cell:
+                    dirty_cells.add(selected_cell)
+                selected_cell = (row, col)
+                dirty_cells.add(selected_cell)
+                print(f"ヒント: ({row + 1}, {col + 1}) = {SYMBOLS[hint.value - 1]} ({hint.technique})")
+                
+                if tracker.is_complete():
+                    print("おめでとうございます！パズルが完成しました！")
+                    running = False
             
             elif event.type == pygame.KEYDOWN and selected_cell:
                 row, col = selected_cell
                 if event.key == pygame.K_BACKSPACE or event.key == pygame.K_DELETE:
                     board[row][col] = 0
-                elif event.unicode.isdigit() and event.unicode != '0':
-                    board[row][col] = int(event.unicode)
+                elif event.unicode and event.unicode.upper() in SYMBOLS[:N]:
+                    board[row][col] = SYMBOLS.index(event.unicode.upper()) + 1
                 
-                invalid_cells = check_board_validity(board)
+                dirty_cells |= tracker.set(row, col, board[row][col])
+                dirty_cells.add(selected_cell)
                 
                 # 盤面が完成したかチェック
-                if not invalid_cells and all(all(cell != 0 for cell in row) for row in board):
+                if tracker.is_complete():
                     print("おめでとうございます！パズルが完成しました！")
                     running = False
+        
+        # 変化したマスだけ描き直す
+        if dirty_cells and not full_redraw:
+            rects = [draw_cell(board, original_board, row, col, selected_cell, tracker.invalid_cells)
+                     for row, col in dirty_cells]
+            pygame.display.update(rects)
+        
+        clock.tick(FPS)
     
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,195 @@
+# 数独問題のバイナリ保存形式
+#
+# ヘッダ + 難易度インデックス + 固定長レコードの並び。レコードは難易度ごとに連続して並ぶので、
+# 指定した難易度の問題を mmap 上から O(1) でランダムに取り出せる。
+#   packed: 1マス4ビット (81マス → 41バイト)
+#   text:   81文字の文字列 (空きマスは '.')
+# 例: python store.py pack puzzles.jsonl puzzles.sdk
+#     python store.py pack valid_puzzles.json puzzles.sdk --difficulty intermediate
+#     python store.py random puzzles.sdk advanced
+
+import argparse
+import json
+import mmap
+import random
+import struct
+
+MAGIC = b"SDKP"
+VERSION = 1
+MODES = {"packed": 0, "text": 1}
+RECORD_SIZES = {"packed": 41, "text": 81}
+HEADER = struct.Struct("<4sBBHI")  # マジック, バージョン, モード, レコード長, 難易度数
+INDEX_ENTRY = struct.Struct("<16sII")  # 難易度名, 先頭レコード番号, 件数
+
+
+def encode_board(board, mode="packed"):
+    """ 盤面 (2次元リストまたは81文字) をレコードのバイト列に変換 """
+    if isinstance(board, str):
+        cells = [int(ch) if ch not in ".0" else 0 for ch in board]
+    else:
+        cells = [num for row in board for num in row]
+    if len(cells) != 81:
+        raise ValueError("9×9 の盤面のみ保存できます")
+    if mode == "text":
+        return "".join(str(num) if num else "." for num in cells).encode("ascii")
+    cells.append(0)
+    return bytes((cells[i] << 4) | cells[i + 1] for i in range(0, 82, 2))
+
+
+def decode_board(data, mode="packed"):
+    """ レコードのバイト列を盤面 (2次元リスト) に変換 """
+    if mode == "text":
+        cells = [int(ch) if ch not in ".0" else 0 for ch in data.decode("ascii")]
+    else:
+        cells = []
+        for byte in data:
+            cells.append(byte >> 4)
+            cells.append(byte & 0x0F)
+        cells = cells[:81]
+    return [cells[row * 9:row * 9 + 9] for row in range(9)]
+
+
+def write_store(path, puzzles_by_difficulty, mode="packed"):
+    """ {難易度: [盤面, ...]} をバイナリ形式で書き出す """
+    record_size = RECORD_SIZES[mode]
+    entries = []
+    start = 0
+    for difficulty, puzzles in puzzles_by_difficulty.items():
+        entries.append((difficulty, start, len(puzzles)))
+        start += len(puzzles)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, MODES[mode], record_size, len(entries)))
+        for difficulty, first, count in entries:
+            f.write(INDEX_ENTRY.pack(difficulty.encode("utf-8"), first, count))
+        for puzzles in puzzles_by_difficulty.values():
+            for board in puzzles:
+                f.write(encode_board(board, mode))
+
+
+class PuzzleStore:
+    """ バイナリ形式の問題ファイルを mmap で読む """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, mode, self.record_size, entry_count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"数独の問題ファイルではありません: {path}")
+        self.mode = {value: name for name, value in MODES.items()}[mode]
+
+        self.index = {}
+        offset = HEADER.size
+        for _ in range(entry_count):
+            name, first, count = INDEX_ENTRY.unpack_from(self.mm, offset)
+            self.index[name.rstrip(b"\0").decode("utf-8")] = (first, count)
+            offset += INDEX_ENTRY.size
+        self.data_offset = offset
+        self.total = sum(count for _, count in self.index.values())
+
+    def __len__(self):
+        return self.total
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def difficulties(self):
+        """ 難易度ごとの問題数 """
+        return {name: count for name, (_, count) in self.index.items()}
+
+    def get(self, number):
+        """ 通し番号 number の問題を返す """
+        if not 0 <= number < self.total:
+            raise IndexError(number)
+        offset = self.data_offset + number * self.record_size
+        return decode_board(self.mm[offset:offset + self.record_size], self.mode)
+
+    def random(self, difficulty, rng=random):
+        """ 指定した難易度の問題をランダムに1つ返す """
+        first, count = self.index[difficulty]
+        if count == 0:
+            raise KeyError(f"{difficulty} の問題がありません")
+        return self.get(first + rng.randrange(count))
+
+    def iter_difficulty(self, difficulty):
+        """ 指定した難易度の問題を順に返す """
+        first, count = self.index[difficulty]
+        for number in range(first, first + count):
+            yield self.get(number)
+
+
+def load_json_puzzles(path, difficulty="intermediate"):
+    """ save_problems() の JSON または batch.py の JSON Lines を {難易度: [盤面, ...]} として読む """
+    puzzles = {}
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    puzzles.setdefault(record["difficulty"], []).append(record["puzzle"])
+        else:
+            puzzles[difficulty] = json.load(f)
+    return puzzles
+
+
+def json_to_store(json_paths, store_path, difficulty="intermediate", mode="packed"):
+    """ JSON / JSON Lines の問題をまとめてバイナリ形式に変換する """
+    merged = {}
+    for path in json_paths:
+        for name, boards in load_json_puzzles(path, difficulty).items():
+            merged.setdefault(name, []).extend(boards)
+    write_store(store_path, merged, mode)
+    return {name: len(boards) for name, boards in merged.items()}
+
+
+def store_to_json(store_path, json_path, difficulty=None):
+    """ バイナリ形式から save_problems() と同じ JSON (盤面のリスト) を書き出す """
+    with PuzzleStore(store_path) as store:
+        names = [difficulty] if difficulty else list(store.index)
+        boards = [board for name in names for board in store.iter_difficulty(name)]
+    with open(json_path, "w") as f:
+        json.dump(boards, f)
+    return len(boards)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数独問題のバイナリ保存形式を扱う")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pack = sub.add_parser("pack", help="JSON / JSON Lines からバイナリ形式に変換")
+    pack.add_argument("inputs", nargs="+")
+    pack.add_argument("output")
+    pack.add_argument("--difficulty", default="intermediate", help="JSON (盤面のリスト) の難易度")
+    pack.add_argument("--mode", choices=list(MODES), default="packed")
+
+    unpack = sub.add_parser("unpack", help="バイナリ形式から JSON に変換")
+    unpack.add_argument("input")
+    unpack.add_argument("output")
+    unpack.add_argument("--difficulty", help="取り出す難易度 (省略時はすべて)")
+
+    pick = sub.add_parser("random", help="指定した難易度の問題をランダムに表示")
+    pick.add_argument("input")
+    pick.add_argument("difficulty")
+
+    args = parser.parse_args(argv)
+    if args.command == "pack":
+        counts = json_to_store(args.inputs, args.output, args.difficulty, args.mode)
+        print(f"{args.output}: " + ", ".join(f"{name} {count} 問" for name, count in counts.items()))
+    elif args.command == "unpack":
+        print(f"{args.output}: {store_to_json(args.input, args.output, args.difficulty)} 問")
+    else:
+        with PuzzleStore(args.input) as store:
+            for row in store.random(args.difficulty):
+                print(" ".join(str(num) if num != 0 else "." for num in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# 盤面の矛盾を差分更新で管理するトラッカー
+#
+# ユニット (行・列・ブロック) ごとに「数字 → その数字が入っているセル」を持ち、
+# 変更されたセルが属する3ユニットだけを更新する。
+
+
+class ConflictTracker:
+    """ 1マスの変更ごとに O(1) で矛盾セルと完成判定を更新する """
+
+    def __init__(self, box=3):
+        n = box * box
+        self.box = box
+        self.n = n
+        self.values = [[0] * n for _ in range(n)]
+        # ユニット番号: 0..n-1 が行, n..2n-1 が列, 2n..3n-1 がブロック
+        self.positions = [[set() for _ in range(n + 1)] for _ in range(3 * n)]
+        self.conflicts = [[0] * n for _ in range(n)]  # セルごとの「重複しているユニット数」
+        self.invalid_cells = set()
+        self.filled = 0
+        self._changed = None
+
+    @classmethod
+    def from_board(cls, board, box=3):
+        """ 既存の盤面からトラッカーを作成 """
+        tracker = cls(box)
+        for row in range(tracker.n):
+            for col in range(tracker.n):
+                if board[row][col]:
+                    tracker.set(row, col, board[row][col])
+        return tracker
+
+    def _units(self, row, col):
+        n, box = self.n, self.box
+        return (row, n + col, 2 * n + (row // box) * box + col // box)
+
+    def _bump(self, cell, delta):
+        row, col = cell
+        before = self.conflicts[row][col]
+        self.conflicts[row][col] = before + delta
+        if before == 0 and delta > 0:
+            self.invalid_cells.add(cell)
+            self._changed.add(cell)
+        elif before + delta == 0:
+            self.invalid_cells.discard(cell)
+            self._changed.add(cell)
+
+    def set(self, row, col, num):
+        """ (row, col) の値を num に変更し、矛盾の有無が変わった可能性のあるセルの集合を返す (0 で消去) """
+        self._changed = set()
+        old = self.values[row][col]
+        if old == num:
+            return self._changed
+        cell = (row, col)
+        units = self._units(row, col)
+
+        if old:
+            self.filled -= 1
+            for unit in units:
+                cells = self.positions[unit][old]
+                cells.discard(cell)
+                if cells:
+                    # 重複が解消されたユニット
+                    self._bump(cell, -1)
+                    if len(cells) == 1:
+                        self._bump(next(iter(cells)), -1)
+
+        self.values[row][col] = num
+
+        if num:
+            self.filled += 1
+            for unit in units:
+                cells = self.positions[unit][num]
+                if cells:
+                    # 新たに重複したユニット
+                    if len(cells) == 1:
+                        self._bump(next(iter(cells)), 1)
+                    self._bump(cell, 1)
+                cells.add(cell)
+        return self._changed
+
+    def is_complete(self):
+        """ 全マスが埋まっていて矛盾がないか """
+        return self.filled == self.n * self.n and not self.invalid_cells
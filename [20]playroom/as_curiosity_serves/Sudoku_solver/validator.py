@@ -0,0 +1,100 @@
+# 数独盤面の一括検証 (NumPy)
+#
+# (N, 9, 9) の uint8 配列を受け取り、全盤面の行・列・ブロックを配列演算でまとめて検証する。
+# 各ユニットの数字をビットに変換して OR で畳み込み、立っているビット数と
+# 0 以外のマスの数が一致しなければ重複がある。
+# 例: python validator.py valid_puzzles.json invalid_puzzles.json
+
+import argparse
+import json
+import math
+import sys
+
+import numpy as np
+
+DEFAULT_CHUNK = 1 << 16  # 一度に処理する盤面数
+
+# 16ビット分のビット数テーブル
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def _popcount(bits):
+    """ uint32 配列の各要素の立っているビット数 """
+    return _POPCOUNT16[bits & 0xFFFF] + _POPCOUNT16[bits >> 16]
+
+
+def _units(boards, box):
+    """ (N, n, n) の盤面を (N, 3n, n) の「行・列・ブロック」の並びに変換 """
+    count, n = boards.shape[0], boards.shape[1]
+    blocks = boards.reshape(count, box, box, box, box).transpose(0, 1, 3, 2, 4).reshape(count, n, n)
+    return np.concatenate((boards, boards.transpose(0, 2, 1), blocks), axis=1)
+
+
+def validate_boards(boards):
+    """ 盤面の配列を検証し、(矛盾がないか, 完成しているか) の bool 配列を返す """
+    boards = np.asarray(boards, dtype=np.uint8)
+    n = boards.shape[-1]
+    box = math.isqrt(n)
+    if boards.ndim != 3 or boards.shape[1] != n or box * box != n:
+        raise ValueError(f"(N, n, n) の盤面配列が必要です: {boards.shape}")
+    if boards.size and boards.max() > n:
+        raise ValueError(f"1〜{n} の範囲外の数字が含まれています")
+
+    units = _units(boards, box)
+    filled = units != 0
+    # 数字 d を 1 << (d-1) に変換 (空きマスはビットを立てない)
+    shifts = np.maximum(units, 1).astype(np.uint32) - 1
+    bits = np.where(filled, np.left_shift(np.uint32(1), shifts), np.uint32(0))
+    seen = np.bitwise_or.reduce(bits, axis=2)
+    no_duplicates = _popcount(seen) == filled.sum(axis=2)
+
+    valid = no_duplicates.all(axis=1)
+    complete = valid & filled.all(axis=(1, 2))
+    return valid, complete
+
+
+def validate_array(boards, chunk_size=DEFAULT_CHUNK):
+    """ メモリマップされた大きな配列を chunk_size 件ずつ検証する """
+    total = boards.shape[0]
+    valid = np.empty(total, dtype=bool)
+    complete = np.empty(total, dtype=bool)
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        valid[start:stop], complete[start:stop] = validate_boards(boards[start:stop])
+    return valid, complete
+
+
+def load_boards(path):
+    """ .npy (メモリマップで開く) または save_problems() の JSON から盤面の配列を読み込む """
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    with open(path, encoding="utf-8") as f:
+        puzzles = json.load(f)
+    return np.array(puzzles, dtype=np.uint8).reshape(len(puzzles), 9, 9)
+
+
+def json_to_npy(json_path, npy_path):
+    """ save_problems() の JSON を .npy に変換する (以降はメモリマップで読める) """
+    np.save(npy_path, load_boards(json_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数独盤面を一括検証する")
+    parser.add_argument("paths", nargs="+", help=".npy または JSON の盤面ファイル")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="一度に処理する盤面数")
+    args = parser.parse_args(argv)
+
+    all_ok = True
+    for path in args.paths:
+        boards = load_boards(path)
+        valid, complete = validate_array(boards, args.chunk)
+        invalid = np.flatnonzero(~valid)
+        print(f"{path}: {len(valid)} 盤面  矛盾なし {int(valid.sum())}  完成 {int(complete.sum())}  矛盾あり {len(invalid)}")
+        if len(invalid):
+            all_ok = False
+            print(f"  矛盾のある盤面の番号 (先頭10件): {invalid[:10].tolist()}")
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
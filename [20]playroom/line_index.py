@@ -0,0 +1,248 @@
+# 大きなテキストファイルの行インデックス
+#
+# バックグラウンドのスレッドで mmap を CHUNK_SIZE ずつ NumPy で走査し、改行の位置から
+# 各行の先頭のバイト位置を array('Q') (1行あたり8バイト) に追加していく。
+# 作成中でも、走査が済んだ範囲の行はすぐに参照できる。
+#
+# 全行の位置を持つとメモリが行数に比例する (30億行で 24GB) ので、K 行ごとの先頭位置 (チェックポイント)
+# だけを持つこともできる。任意の行へは直前のチェックポイントから改行を K 個未満たどって移動する。
+# stride を指定しなければ、全行の位置を持ちつつ memory (既定は空きメモリから決める) を超えたら
+# チェックポイントを1つおきに間引いて K を倍にするので、メモリは常に上限以下に収まる。
+#
+# 作成したインデックスは CACHE_DIR にキャッシュし、次に同じファイルを開いたときは mmap で
+# そのまま使う (読み込み時の変換なし)。パス・サイズ・更新時刻・inode で一致を確かめ、
+# ファイルが大きくなっていて以前の末尾が変わっていなければ (追記) キャッシュの続きから走査する。
+# それ以外の不一致はキャッシュを捨てて作り直す。
+
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CHUNK_SIZE = 16 * 1024 * 1024  # 1回に走査するバイト数
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'large_text_viewer')
+CACHE_MAGIC = b'LTVIDX02'
+# マジック, ファイルサイズ, 更新時刻(ns), inode, K, 改行の数, チェックポイントの数, 末尾 TAIL_BYTES の CRC32
+CACHE_HEADER = struct.Struct('<8sQQQQQQI4x')
+TAIL_BYTES = 4096  # 追記されただけかを確かめるために比べる、キャッシュ作成時の末尾の長さ
+MEMORY_FRACTION = 0.1  # 自動で決める場合、空きメモリのうちインデックスに使う割合
+MAX_MEMORY = 1024 * 1024 * 1024  # 自動で決める場合の上限 (バイト)
+DEFAULT_MEMORY = 256 * 1024 * 1024  # 空きメモリがわからない場合
+
+
+def default_memory():
+    """インデックスに使うメモリの上限 (バイト) を空きメモリから決める"""
+    if psutil is None:
+        return DEFAULT_MEMORY
+    return int(min(MAX_MEMORY, psutil.virtual_memory().available * MEMORY_FRACTION))
+
+
+def cache_path(path):
+    """ファイルごとのキャッシュの場所 (絶対パスのハッシュ)"""
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, key + '.idx')
+
+
+def _tail_crc(mm, size):
+    return zlib.crc32(mm[max(0, size - TAIL_BYTES):size])
+
+
+class LineIndex:
+    """mmap したファイルの行の先頭位置の一覧 (stride 行ごとのチェックポイント)"""
+
+    def __init__(self, mm, path=None, stride=None, memory=None):
+        self.mm = mm
+        self.size = len(mm)
+        self.path = path  # 指定するとキャッシュを使う
+        # stride を指定しない場合は 1 から始め、memory を超えるたびに倍にする
+        self.fixed_stride = stride is not None
+        self.memory = memory or default_memory()
+        # (offsets, K): offsets[i] = i*K 行目の先頭のバイト位置 (読む側が両方を同時に得られるように組にする)
+        self._checkpoints = (array('Q', [0]), stride or 1)
+        self.lines = 0  # 走査済みの範囲にある改行の数
+        self.scanned = 0  # 走査済みのバイト数
+        self.done = self.size == 0
+        self.cached = False  # キャッシュをそのまま使えたか
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = None
+        self._cache_file = None
+        self._cache_mm = None
+        if path:
+            try:
+                self._load_cache()
+            except (OSError, ValueError, TypeError, struct.error):
+                pass  # 読めないキャッシュは無視して作り直す
+
+    @property
+    def offsets(self):
+        return self._checkpoints[0]
+
+    @property
+    def stride(self):
+        return self._checkpoints[1]
+
+    def _load_cache(self):
+        """キャッシュが使えれば読み込む (一致すれば mmap のまま、追記されただけなら続きから走査する)
+
+        壊れたキャッシュ (途中で切れている、数が合わない) は使わずに作り直す。
+        """
+        with open(cache_path(self.path), 'rb') as f:
+            header = f.read(CACHE_HEADER.size)
+            if len(header) != CACHE_HEADER.size:
+                return
+            magic, size, mtime, inode, stride, lines, count, crc = CACHE_HEADER.unpack(header)
+            if magic != CACHE_MAGIC or count == 0:
+                return
+            if os.fstat(f.fileno()).st_size != CACHE_HEADER.size + count * 8:
+                return  # 書き込み途中で切れた、または別の内容で上書きされた
+            if self.fixed_stride and stride != self.stride:
+                return
+            stat = os.stat(self.path)
+            if stat.st_ino != inode or stat.st_size < size or self.size < size:
+                return
+            if stat.st_size == size and stat.st_mtime_ns == mtime:
+                # 変更なし: キャッシュを mmap して、その上のビューを行の一覧として使う
+                cache_file = open(f.name, 'rb')
+                cache_mm = offsets = None
+                try:
+                    cache_mm = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+                    offsets = memoryview(cache_mm)[CACHE_HEADER.size:].cast('Q')
+                    if offsets[0] != 0 or offsets[-1] > size:
+                        raise ValueError("キャッシュの行の位置が不正です")
+                except BaseException:
+                    if offsets is not None:
+                        offsets.release()
+                    if cache_mm is not None:
+                        cache_mm.close()
+                    cache_file.close()
+                    raise
+                self._cache_file = cache_file
+                self._cache_mm = cache_mm
+                self._checkpoints = (offsets, stride)
+                self.lines = lines
+                self.scanned = size
+                self.done = True
+                self.cached = True
+                return
+            if stat.st_size == size or _tail_crc(self.mm, size) != crc:
+                return  # 同じ大きさのまま書き換えられた、または追記以外の変更 (作り直す)
+            # 追記されただけ: キャッシュした位置の続きから走査する
+            offsets = array('Q')
+            offsets.frombytes(f.read(count * offsets.itemsize))
+            if len(offsets) != count or offsets[0] != 0 or offsets[-1] > size:
+                return
+            self._checkpoints = (offsets, stride)
+            self.lines = lines
+            self.scanned = size
+
+    def save_cache(self):
+        """完成したインデックスをキャッシュに書き出す"""
+        stat = os.stat(self.path)
+        if stat.st_size != self.size:
+            return
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        target = cache_path(self.path)
+        temporary = f'{target}.{os.getpid()}.tmp'
+        offsets, stride = self._checkpoints
+        with open(temporary, 'wb') as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, self.size, stat.st_mtime_ns, stat.st_ino, stride,
+                                      self.lines, len(offsets), _tail_crc(self.mm, self.size)))
+            f.write(offsets)
+        os.replace(temporary, target)
+
+    @property
+    def progress(self):
+        """走査の進み具合 (0.0〜1.0)"""
+        return self.scanned / self.size if self.size else 1.0
+
+    @property
+    def line_count(self):
+        """先頭位置がわかっている行数 (末尾が改行で終わる場合、その後ろの空行は数えない)"""
+        count = self.lines + 1
+        if self.done and self.lines and self.mm[self.size - 1] == 0x0A:
+            count -= 1
+        return count
+
+    def estimated_line_count(self):
+        """全体の行数 (作成中は走査済みの割合から見積もる)"""
+        if self.done or not self.scanned:
+            return self.line_count
+        return max(self.line_count, int(self.line_count / self.progress))
+
+    def line_start(self, line):
+        """line 行目の先頭のバイト位置 (直前のチェックポイントから改行をたどる)"""
+        offsets, stride = self._checkpoints
+        checkpoint, rest = divmod(line, stride)
+        position = offsets[checkpoint]
+        find = self.mm.find
+        for _ in range(rest):
+            position = find(b'\n', position) + 1
+        return position
+
+    def line_number(self, offset):
+        """行の先頭のバイト位置 offset が何行目か (走査済みの範囲のみ)"""
+        offsets, stride = self._checkpoints
+        checkpoint = bisect.bisect_right(offsets, offset) - 1
+        position = offsets[checkpoint]
+        if offset == position:
+            return checkpoint * stride
+        newlines = np.count_nonzero(np.frombuffer(self.mm, dtype=np.uint8, count=offset - position,
+                                                  offset=position) == 0x0A)
+        return checkpoint * stride + int(newlines)
+
+    def start(self):
+        """バックグラウンドのスレッドでインデックスを作成する (キャッシュで完成している場合は何もしない)"""
+        if self.done:
+            return
+        self._thread = threading.Thread(target=self.build, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """作成を中止し、スレッドの終了を待つ (mmap を閉じる前に呼ぶ)"""
+        self._cancel.set()
+        if self._thread:
+            self._thread.join()
+        if self._cache_mm:
+            self.offsets.release()
+            self._cache_mm.close()
+            self._cache_file.close()
+            self._cache_mm = None
+
+    def build(self):
+        try:
+            while self.scanned < self.size and not self._cancel.is_set():
+                position = self.scanned
+                length = min(CHUNK_SIZE, self.size - position)
+                chunk = np.frombuffer(self.mm, dtype=np.uint8, count=length, offset=position)
+                starts = np.flatnonzero(chunk == 0x0A)
+                del chunk  # mmap への参照を残さない (残っていると mmap を閉じられない)
+                offsets, stride = self._checkpoints
+                # 改行の次の行 (lines + 1 + i 行目) のうち、stride の倍数の行だけを残す
+                first = -(self.lines + 1) % stride
+                kept = starts[first::stride] + (position + 1)
+                offsets.frombytes(kept.astype(np.uint64).tobytes())
+                self.lines += len(starts)
+                self.scanned = position + length
+                if not self.fixed_stride and len(offsets) * offsets.itemsize > self.memory:
+                    # 上限を超えたらチェックポイントを1つおきに間引く (K を倍にする)
+                    while len(offsets) * offsets.itemsize > self.memory:
+                        offsets = offsets[::2]
+                        stride *= 2
+                    self._checkpoints = (offsets, stride)
+            self.done = self.scanned >= self.size
+            if self.done and self.path:
+                self.save_cache()
+        except Exception as e:
+            self.error = e
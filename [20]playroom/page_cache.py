@@ -0,0 +1,137 @@
+# デコード済みのページの LRU キャッシュと先読み
+#
+# PAGE_LINES 行を1ページとして、mmap からまとめて切り出し1回でデコードする
+# (デコードできないページだけ行ごとにデコードし直し、失敗した行は [デコードエラー] にする)。
+# 最近使った CACHE_PAGES ページを保持し、スクロールしている方向の先のページは
+# ワーカースレッドが先にデコードしておくので、表示のたびにデコードせずに済む。
+# 先読みの指示は最新の1件だけを持ち (スクロールバーを速く動かしても溜まらない)、
+# 新しい指示が来たら古い指示の残りは捨てる。
+# 例: cache = PageCache(mm, index); cache.start(); cache.lines(1000, 40)
+
+import threading
+from collections import OrderedDict
+
+PAGE_LINES = 256  # 1ページの行数
+CACHE_PAGES = 64  # 保持するページ数
+PREFETCH_PAGES = 4  # スクロール方向に先読みするページ数
+DECODE_ERROR = "[デコードエラー]"
+
+
+def decode_lines(data):
+    """改行で区切られたバイト列を、改行を除いた行のリストにする"""
+    try:
+        lines = data.decode('utf-8').split('\n')
+    except UnicodeDecodeError:
+        lines = []
+        for line in data.split(b'\n'):
+            try:
+                lines.append(line.decode('utf-8'))
+            except UnicodeDecodeError:
+                lines.append(DECODE_ERROR)
+    if data.endswith(b'\n'):
+        lines.pop()
+    return lines
+
+
+class PageCache:
+    """LineIndex で位置を求めた行を、ページ単位でデコードして保持する"""
+
+    def __init__(self, mm, index, page_lines=PAGE_LINES, capacity=CACHE_PAGES):
+        self.mm = mm
+        self.index = index
+        self.page_lines = page_lines
+        self.capacity = capacity
+        self._pages = OrderedDict()  # ページ番号 -> 行のリスト (末尾が最近使ったもの)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._target = None  # 最新の先読みの指示 (ページ番号, 方向)
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        """先読みのワーカースレッドを起動する"""
+        self._thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """残りの先読みを捨て、ワーカースレッドの終了を待つ (mmap を閉じる前に呼ぶ)"""
+        with self._wakeup:
+            self._closed = True
+            self._target = None
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _decode(self, page):
+        """ページをデコードし、(行のリスト, キャッシュしてよいか) を返す"""
+        index = self.index
+        first = page * self.page_lines
+        line_count = index.line_count
+        if first >= line_count:
+            return [], False
+        start = index.line_start(first)
+        if first + self.page_lines < line_count:
+            return decode_lines(self.mm[start:index.line_start(first + self.page_lines)]), True
+        # 最後のページ (インデックス作成中はまだ行が増えるのでキャッシュしない)
+        end = index.size if index.done else index.scanned
+        lines = decode_lines(self.mm[start:end])[:line_count - first]
+        return lines, index.done
+
+    def page(self, page):
+        """ページの行のリスト (キャッシュに無ければデコードする)"""
+        with self._lock:
+            lines = self._pages.get(page)
+            if lines is not None:
+                self._pages.move_to_end(page)
+                return lines
+        lines, complete = self._decode(page)
+        if complete:
+            with self._lock:
+                self._pages[page] = lines
+                while len(self._pages) > self.capacity:
+                    self._pages.popitem(last=False)
+        return lines
+
+    def lines(self, start, count):
+        """start 行目から count 行 (ファイルの終わりまで)"""
+        result = []
+        page, skip = divmod(start, self.page_lines)
+        while len(result) < count:
+            lines = self.page(page)
+            result.extend(lines[skip:skip + count - len(result)])
+            if len(lines) < self.page_lines:
+                break
+            page += 1
+            skip = 0
+        return result
+
+    def prefetch(self, line, direction):
+        """line 行目から direction (1: 下, -1: 上) の方向のページを先読みさせる (前の指示は置き換える)"""
+        with self._wakeup:
+            self._target = (line // self.page_lines, direction)
+            self._wakeup.notify()
+
+    def _prefetch_worker(self):
+        while True:
+            with self._wakeup:
+                while self._target is None and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                page, direction = self._target
+                self._target = None
+            for i in range(1, PREFETCH_PAGES + 1):
+                target = page + i * direction
+                # 新しい指示が来たら、この指示の残りは読まない
+                if target < 0 or self._target is not None or self._closed:
+                    break
+                with self._lock:
+                    cached = target in self._pages
+                if cached:
+                    continue
+                try:
+                    self.page(target)
+                except Exception as e:
+                    print(f"先読みエラー: {str(e)}")
+                    break
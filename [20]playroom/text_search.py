@@ -0,0 +1,207 @@
+# 大きなテキストファイルの並列検索 (部分文字列 / 正規表現)
+#
+# ファイルを CHUNK_BYTES ずつのチャンクに分け、プロセスプールで並列に検索する。
+# チャンクの境界は改行の直後に合わせるので、1行の中の一致が境界で切れたり2回数えられたりしない
+# (改行を含む正規表現の一致は、チャンクをまたぐと見つからない)。
+# 各ワーカーは自分でファイルを mmap し、一致した行の先頭のバイト位置だけを返す。
+# 結果はチャンクの順に受け取り、行インデックスで行番号に直して results に追加していく。
+# 例: python text_search.py error.log Traceback
+#     python text_search.py error.log "ERROR [0-9]+" --regex
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from line_index import LineIndex
+
+CHUNK_BYTES = 64 * 1024 * 1024  # 1つのタスクで検索するバイト数
+MAX_RESULTS = 100_000  # これ以上は検索を打ち切る (結果の一覧が大きくなりすぎないように)
+
+_compiled = {}  # ワーカープロセス内でコンパイル済みの正規表現
+
+
+def _search_chunk(path, start, end, pattern, regex, limit):
+    """ワーカープロセス: start〜end (どちらも行の先頭) で一致した行の先頭位置を返す"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if regex:
+            compiled = _compiled.get(pattern)
+            if compiled is None:
+                compiled = _compiled[pattern] = re.compile(pattern, re.MULTILINE)
+        found = []
+        position = start
+        while position < end and len(found) < limit:
+            if regex:
+                match = compiled.search(mm, position, end)
+                hit = match.start() if match else -1
+            else:
+                hit = mm.find(pattern, position, end)
+            if hit < 0 or hit >= end:  # end での空の一致は次のチャンクの行のもの
+                break
+            line_start = mm.rfind(b'\n', start, hit) + 1 or start
+            found.append(line_start)
+            # 同じ行の2つ目以降の一致は数えない
+            line_end = mm.find(b'\n', hit, end)
+            position = end if line_end < 0 else line_end + 1
+        return found
+
+
+class Search:
+    """ファイル全体を並列に検索し、一致した行を (行番号, 行の先頭位置) として results に順に追加する
+
+    start() でバックグラウンドのスレッドから実行し、cancel() で打ち切る。
+    callback を渡すと、チャンクごとに新しく見つかった結果のリストを渡して呼ぶ (検索のスレッドから)。
+    """
+
+    def __init__(self, path, pattern, index, regex=False, processes=None,
+                 chunk_bytes=CHUNK_BYTES, max_results=MAX_RESULTS, callback=None):
+        if isinstance(pattern, str):
+            pattern = pattern.encode('utf-8')
+        if regex:
+            re.compile(pattern, re.MULTILINE)  # 不正なパターンはここで re.error にする
+        self.path = path
+        self.pattern = pattern
+        self.index = index  # 行番号に直すための LineIndex (作成中でもよい)
+        self.regex = regex
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self.max_results = max_results
+        self.callback = callback
+        # 行インデックスを作った mmap の大きさまでを検索する (その後の追記は行番号に直せないので含めない)
+        self.size = index.size
+        self.results = []
+        self.scanned = 0  # 検索が済んだバイト数
+        self.elapsed = 0.0
+        self.running = False
+        self.done = False
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    @property
+    def progress(self):
+        return self.scanned / self.size if self.size else 1.0
+
+    @property
+    def throughput(self):
+        """検索の速さ (GB/s)"""
+        return self.scanned / self.elapsed / 1e9 if self.elapsed else 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self):
+        if self._thread:
+            self._thread.join()
+
+    def _chunks(self, mm):
+        """改行の直後に揃えたチャンクの (開始, 終了) を順に返す"""
+        start = 0
+        while start < self.size:
+            end = min(start + self.chunk_bytes, self.size)
+            if end < self.size:
+                newline = mm.find(b'\n', end, self.size)
+                end = self.size if newline < 0 else newline + 1
+            yield start, end
+            start = end
+
+    def _wait_for_index(self, position):
+        """position までのインデックスができるのを待つ (打ち切られたら False)"""
+        index = self.index
+        while index.scanned < position and not index.done:
+            if index.error:
+                raise index.error
+            if self._cancel.wait(0.05):
+                return False
+        return True
+
+    def run(self):
+        self.running = True
+        began = time.perf_counter()
+        # Tk のスレッドがあるプロセスから fork しないように spawn で起動する
+        executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chunks = self._chunks(mm)
+                pending = deque()
+                while not self._cancel.is_set():
+                    # 実行中のタスクをプロセス数の2倍までに抑え、先に投入したものから順に受け取る
+                    while len(pending) < 2 * self.processes:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        pending.append((chunk[1], executor.submit(
+                            _search_chunk, self.path, chunk[0], chunk[1], self.pattern, self.regex,
+                            self.max_results)))
+                    if not pending:
+                        break
+                    end, future = pending.popleft()
+                    found = future.result()
+                    if not self._wait_for_index(end):
+                        break
+                    found = found[:self.max_results - len(self.results)]
+                    batch = [(self.index.line_number(offset), offset) for offset in found]
+                    self.results.extend(batch)
+                    self.scanned = end
+                    self.elapsed = time.perf_counter() - began
+                    if batch and self.callback:
+                        self.callback(batch)
+                    if len(self.results) >= self.max_results:
+                        break
+            self.done = not self._cancel.is_set()
+        except Exception as e:
+            self.error = e
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.elapsed = time.perf_counter() - began
+            self.running = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="大きなテキストファイルを並列に検索する")
+    parser.add_argument("path", help="検索するファイル")
+    parser.add_argument("pattern", help="検索する文字列 (--regex の場合は正規表現)")
+    parser.add_argument("--regex", action="store_true", help="pattern を正規表現として扱う")
+    parser.add_argument("--processes", type=int, help="ワーカープロセスの数 (省略時は CPU 数)")
+    parser.add_argument("--max", type=int, default=MAX_RESULTS, help="表示する結果の上限")
+    args = parser.parse_args(argv)
+
+    with open(args.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index = LineIndex(mm, args.path)
+        index.start()
+
+        def show(batch):
+            for line, offset in batch:
+                end = mm.find(b'\n', offset)
+                text = mm[offset:end if end >= 0 else len(mm)].decode('utf-8', errors='replace')
+                print(f"{line + 1}: {text}")
+
+        search = Search(args.path, args.pattern, index, args.regex, args.processes,
+                        max_results=args.max, callback=show)
+        try:
+            search.run()
+        except KeyboardInterrupt:
+            search.cancel()
+        index.close()
+    if search.error:
+        print(f"検索エラー: {str(search.error)}")
+    print(f"{len(search.results):,} 件  {search.scanned / 1e9:.2f} GB を {search.elapsed:.2f} 秒 "
+          f"({search.throughput:.2f} GB/s)")
+
+
+if __name__ == "__main__":
+    main()